@@ -0,0 +1,143 @@
+import asyncio
+import calendar
+from concurrent.futures import ThreadPoolExecutor
+
+from clock import SYSTEM_CLOCK
+from expense import DailyBudgetTracker
+
+
+class AsyncBudgetTracker:
+    # Non-blocking front end for DailyBudgetTracker. File I/O runs on a small
+    # thread pool, and add_expense calls for the same month that arrive while
+    # a write is queued or in flight are coalesced into a single add_expenses
+    # batch, so thousands of concurrent callers cost a handful of writes.
+    def __init__(self, base_folder="budget_data", year=None, month=None, max_workers=4, clock=None):
+        self.clock = clock or SYSTEM_CLOCK
+        today = self.clock.today()
+        self.follows_clock = year is None and month is None
+        self.base_folder = base_folder
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="budget-io")
+        self.io_slots = asyncio.Semaphore(max_workers)
+        self.trackers = {}
+        self.month_locks = {}
+        self.pending = {}
+        self.writers = {}
+        self.batches_written = 0
+        self.select_month(year or today.year, month or today.month)
+
+    def select_month(self, year, month):
+        self.current_year = year
+        self.current_month = month
+        self.current_month_name = calendar.month_name[month]
+
+    def month_key(self):
+        if self.follows_clock:
+            today = self.clock.today()
+            if (today.year, today.month) != (self.current_year, self.current_month):
+                self.select_month(today.year, today.month)
+        return (self.current_year, self.current_month)
+
+    def month_tracker(self, key):
+        tracker = self.trackers.get(key)
+        if tracker is None:
+            tracker = DailyBudgetTracker(self.base_folder, *key, clock=self.clock)
+            self.trackers[key] = tracker
+            self.month_locks[key] = asyncio.Lock()
+        return tracker
+
+    async def run_io(self, key, func, *args):
+        # Only one job per month touches that month's files at a time; the
+        # semaphore keeps the executor's backlog bounded across months.
+        self.month_tracker(key)
+        async with self.month_locks[key], self.io_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    async def set_budget(self, amount):
+        key = self.month_key()
+        return await self.run_io(key, self.month_tracker(key).set_budget, amount)
+
+    async def load_budget(self):
+        key = self.month_key()
+        return await self.run_io(key, self.month_tracker(key).load_budget)
+
+    async def check_budget(self):
+        key = self.month_key()
+        return await self.run_io(key, self.month_tracker(key).check_budget)
+
+    async def get_expense_summary(self):
+        key = self.month_key()
+        return await self.run_io(key, self.month_tracker(key).get_expense_summary)
+
+    async def add_expense(self, category, amount, key=None):
+        if key is not None:
+            # Keyed calls are checked and written on their own rather than
+            # joining a batch, which would share one message between callers.
+            month = self.month_key()
+            return await self.run_io(month, self.month_tracker(month).add_expenses, [(category, amount)], key)
+        key = self.month_key()
+        future = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(key, []).append((category, amount, future))
+        if key not in self.writers:
+            self.writers[key] = asyncio.create_task(self.drain(key))
+        return await future
+
+    async def edit_expense(self, transaction_id, category=None, amount=None):
+        # Expenses still waiting to be written can't be edited until they are.
+        key = self.month_key()
+        await self.flush()
+        return await self.run_io(key, self.month_tracker(key).edit_expense, transaction_id, category, amount)
+
+    async def delete_expense(self, transaction_id):
+        key = self.month_key()
+        await self.flush()
+        return await self.run_io(key, self.month_tracker(key).delete_expense, transaction_id)
+
+    async def drain(self, key):
+        tracker = self.month_tracker(key)
+        try:
+            while self.pending.get(key):
+                batch = self.pending.pop(key)
+                expenses = [(category, amount) for category, amount, _ in batch]
+                try:
+                    budget_data = await self.run_io(key, self.write_batch, tracker, expenses)
+                except Exception as e:
+                    for *_, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self.batches_written += 1
+                self.resolve_batch(tracker, batch, budget_data)
+        finally:
+            del self.writers[key]
+
+    def write_batch(self, tracker, expenses):
+        tracker.add_expenses(expenses)
+        return tracker.load_budget()
+
+    def resolve_batch(self, tracker, batch, budget_data):
+        # Each caller gets the message it would have seen had its expense been
+        # written on its own: the remaining budget right after that entry.
+        remaining = budget_data["remaining"] + sum(amount for _, amount, _ in batch) if budget_data else None
+        for _, amount, future in batch:
+            if remaining is not None:
+                remaining -= amount
+                message = tracker.expense_added_message({"remaining": remaining})
+            else:
+                message = tracker.expense_added_message(None)
+            if not future.done():
+                future.set_result(message)
+
+    async def flush(self):
+        while self.writers:
+            await asyncio.gather(*self.writers.values(), return_exceptions=True)
+
+    async def close(self):
+        await self.flush()
+        self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
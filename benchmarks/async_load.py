@@ -0,0 +1,55 @@
+"""Concurrent-coroutine load test for AsyncBudgetTracker.
+
+Fires thousands of add_expense coroutines at once against a scratch data
+folder, then re-reads the month from disk to confirm nothing was lost and
+reports how many batched writes it took.
+
+    python benchmarks/async_load.py --callers 5000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expense import DailyBudgetTracker
+from async_tracker import AsyncBudgetTracker
+
+
+async def run(base_folder, callers, budget):
+    async with AsyncBudgetTracker(base_folder) as tracker:
+        await tracker.set_budget(budget)
+        started = time.perf_counter()
+        await asyncio.gather(*(tracker.add_expense(f"caller-{i % 20}", 1.0) for i in range(callers)))
+        elapsed = time.perf_counter() - started
+        summary = await tracker.get_expense_summary()
+    return elapsed, tracker.batches_written, summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=5000)
+    parser.add_argument("--budget", type=float, default=1_000_000.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as base_folder:
+        elapsed, batches, summary = asyncio.run(run(base_folder, args.callers, args.budget))
+        on_disk = DailyBudgetTracker(base_folder)
+        stored = len(on_disk.load_transactions())
+        remaining = on_disk.load_budget()["remaining"]
+
+    print(f"callers={args.callers} elapsed={elapsed:.3f}s batches={batches}")
+    print(f"add_expense throughput: {args.callers / elapsed:,.0f} ops/sec")
+    print(f"stored={stored} remaining={remaining:.2f} expected={args.budget - args.callers:.2f}")
+    if stored != args.callers or remaining != args.budget - args.callers:
+        print(f"FAILED: {args.callers - stored} lost updates")
+        return 1
+    print("OK: zero lost updates")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Categorization throughput: compiled matcher against naive per-rule matching.
+
+Generates a rule set of keyword and regex rules and a stream of payee
+descriptions (a skewed mix of repeat payees, like a real statement), then
+categorizes the stream three ways: trying every rule in turn, the compiled
+Categorizer with its cache off, and with the cache on. Checks that all three
+agree on every row and reports rows/sec for each.
+
+    python benchmarks/bench_categorize.py --rules 5000 --rows 200000
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from categorization import Categorizer, Rule
+from fingerprints import normalize_description
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "ze", "po", "qu", "an", "el", "or", "ix"]
+CATEGORIES = ["Groceries", "Coffee", "Transport", "Dining", "Shopping", "Utilities", "Health", "Travel"]
+
+
+def word(rng, syllables):
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables))
+
+
+def make_rules(rng, count, regex_share):
+    rules = []
+    for index in range(count):
+        category = rng.choice(CATEGORIES)
+        if rng.random() < regex_share:
+            rules.append(Rule(category, regex=rf"\b{word(rng, 2)}\s*#?\d{{{rng.randint(2, 4)}}}\b"))
+        else:
+            rules.append(Rule(category, keyword=f"{word(rng, rng.randint(2, 3))} {word(rng, 2)}"))
+    return rules
+
+
+def make_descriptions(rng, rules, rows, payees):
+    keywords = [rule.keyword for rule in rules if rule.keyword]
+    pool = []
+    for _ in range(payees):
+        roll = rng.random()
+        if roll < 0.5:
+            text = f"POS {rng.choice(keywords).upper()} STORE {rng.randint(1, 999)}"
+        elif roll < 0.6:
+            text = f"{word(rng, 2)} #{rng.randint(10, 9999)} CARD PURCHASE"
+        else:
+            text = f"{word(rng, 3)} {word(rng, 2)} {rng.randint(1000, 99999)}"
+        pool.append(text)
+    # A few payees account for most rows.
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+    return rng.choices(pool, weights, k=rows)
+
+
+def naive(rules, compiled):
+    keywords = [normalize_description(rule.keyword) if rule.keyword else None for rule in rules]
+
+    def categorize(description):
+        normalized = normalize_description(description)
+        for rule, keyword, regex in zip(rules, keywords, compiled):
+            if regex is None:
+                if keyword and keyword in normalized:
+                    return rule.category
+            elif regex.search(description):
+                return rule.category
+        return None
+    return categorize
+
+
+def measure(label, categorize, descriptions):
+    started = time.perf_counter()
+    results = [categorize(description) for description in descriptions]
+    elapsed = time.perf_counter() - started
+    print(f"{label:<18} {len(descriptions) / elapsed:>12,.0f} rows/sec  ({elapsed * 1000:,.0f} ms)")
+    return results, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=5000)
+    parser.add_argument("--regex-share", type=float, default=0.05, help="fraction of rules that are regexes")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--payees", type=int, default=20_000, help="distinct descriptions in the stream")
+    parser.add_argument("--naive-rows", type=int, default=5_000,
+                        help="rows to time the naive matcher on (it is slow); checked against the same rows")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    rules = make_rules(rng, args.rules, args.regex_share)
+    descriptions = make_descriptions(rng, rules, args.rows, args.payees)
+
+    started = time.perf_counter()
+    categorizer = Categorizer(rules)
+    print(f"rules={len(rules)} rows={len(descriptions)} compile={1000 * (time.perf_counter() - started):.1f} ms")
+
+    compiled = [re.compile(rule.regex, re.IGNORECASE) if rule.regex else None for rule in rules]
+    sample = descriptions[:args.naive_rows]
+    expected, naive_seconds = measure("naive per-rule", naive(rules, compiled), sample)
+
+    uncached = Categorizer(rules, cache_size=0)
+    uncached_results, uncached_seconds = measure(
+        "compiled", lambda description: uncached.categorize(description), descriptions)
+    cached_results, cached_seconds = measure("compiled + cache", categorizer.categorize, descriptions)
+
+    mismatches = sum(1 for a, b in zip(expected, uncached_results) if a != b)
+    mismatches += sum(1 for a, b in zip(uncached_results, cached_results) if a != b)
+    matched = sum(1 for result in cached_results if result)
+    print(f"matched={matched / len(descriptions):.1%} "
+          f"speedup={naive_seconds / len(sample) / (uncached_seconds / len(descriptions)):,.0f}x uncached")
+    if mismatches:
+        print(f"FAIL: {mismatches} rows categorized differently")
+        return 1
+    print("OK: compiled matcher agrees with per-rule matching")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Category completion latency with tens of thousands of categories.
+
+Generates categories with skewed, time-spread usage, records it in the
+stats file one day's batch at a time and times loading it back, then replays typing: every prefix of sampled
+category names is completed as if typed one key at a time. Reports per-key
+latency percentiles and checks a sample of completions against a full scan
+of every category.
+
+    python benchmarks/bench_completion.py --categories 50000 --typed 2000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import itertools
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collections import Counter
+
+from category_stats import CategoryStats, SUGGESTIONS
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "ze", "po", "qu", "an", "el", "or", "ix"]
+DAY = 86400
+
+
+def make_names(rng, count):
+    names = set()
+    while len(names) < count:
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                 for _ in range(rng.randint(1, 2))]
+        names.add(" ".join(words).title())
+    return sorted(names)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, default=50_000)
+    parser.add_argument("--uses", type=int, default=200_000, help="recorded uses, spread over a year")
+    parser.add_argument("--typed", type=int, default=2_000, help="category names typed key by key")
+    parser.add_argument("--checked", type=int, default=300, help="completions checked against a full scan")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    names = make_names(rng, args.categories)
+    weights = [1 / (rank + 1) for rank in range(len(names))]
+    clock = [0.0]
+
+    with tempfile.TemporaryDirectory() as base_folder:
+        stats = CategoryStats(base_folder, now=lambda: clock[0])
+        stats.load(names)
+        uses = sorted(zip(sorted(rng.randrange(365) for _ in range(args.uses)),
+                          rng.choices(names, weights, k=args.uses)))
+        for day, batch in itertools.groupby(uses, key=lambda use: use[0]):
+            clock[0] = day * DAY
+            stats.record(Counter(name for _, name in batch))
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        loaded = CategoryStats(base_folder, now=lambda: clock[0]).load(names)
+        load_ms = (time.perf_counter() - started) * 1000
+        memory_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+        print(f"categories={len(loaded.trie)} load={load_ms:,.0f} ms trie={memory_mb:,.1f} MB")
+
+    latencies = []
+    prefixes = []
+    for name in rng.choices(names, weights, k=args.typed):
+        for end in range(1, len(name) + 1):
+            prefix = name[:end].lower()
+            started = time.perf_counter()
+            loaded.complete(prefix)
+            latencies.append(time.perf_counter() - started)
+            prefixes.append(prefix)
+    print(f"keystrokes={len(latencies):,} p50={percentile(latencies, 0.5) * 1e6:.1f}us "
+          f"p99={percentile(latencies, 0.99) * 1e6:.1f}us max={max(latencies) * 1e6:.1f}us")
+
+    ranks = loaded.trie.ranks
+    mismatches = 0
+    for prefix in rng.sample(prefixes, min(args.checked, len(prefixes))):
+        matching = [name for name in names if name.casefold().startswith(prefix)]
+        expected = sorted(matching, key=lambda name: -ranks[name])[:SUGGESTIONS]
+        got = loaded.complete(prefix)
+        if [ranks[name] for name in got] != [ranks[name] for name in expected]:
+            mismatches += 1
+    if mismatches:
+        print(f"FAIL: {mismatches} completions differ from a full scan")
+        return 1
+    if percentile(latencies, 0.99) >= 0.001:
+        print("FAIL: p99 completion latency is 1 ms or more")
+        return 1
+    print("OK: completions match a full scan, p99 under 1 ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
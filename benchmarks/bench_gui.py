@@ -0,0 +1,175 @@
+"""Headless interaction-latency benchmark for BudgetTrackerGUI.
+
+Runs the real window under the offscreen Qt platform against generated
+datasets (see datagen.py) and scripts the interactions users complain about:
+page switches, expense submission, a quick-entry batch of rows and summary
+refresh. Each sample covers the
+handler plus the event processing (layout and paint) it triggers.
+QMessageBox is replaced with no-op stubs so only our code is timed.
+
+It then pastes a large block of spreadsheet rows and commits it, reporting how
+long parsing and adding took and the longest the event loop went without
+running, which is how long the window would have been frozen.
+
+    python benchmarks/bench_gui.py --sizes 1e3 1e4 1e5 --rounds 50
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import expense
+from expense import BudgetTrackerGUI, DailyBudgetTracker
+from datagen import generate_dataset
+from PyQt6.QtWidgets import QApplication, QTableWidgetItem
+
+YEAR, MONTH = 2024, 8
+
+
+class SilentMessageBox:
+    # Stands in for QMessageBox: counts dialogs instead of blocking on them.
+    shown = 0
+
+    @classmethod
+    def show(cls, *args, **kwargs):
+        cls.shown += 1
+
+    information = warning = critical = question = show
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(app, samples, name, action):
+    app.processEvents()
+    started = time.perf_counter()
+    action()
+    app.processEvents()
+    samples.setdefault(name, []).append(time.perf_counter() - started)
+
+
+def submit_expense(gui, amount):
+    gui.show_expense_page()
+    gui.category_input.setText("coffee")
+    gui.amount_input.setText(f"{amount:.2f}")
+    return gui.add_expense
+
+
+def stage_entries(gui, rows):
+    gui.show_entry_page()
+    table = gui.entry_table
+    table.setRowCount(rows + 1)
+    for row in range(rows):
+        table.setItem(row, 0, QTableWidgetItem("coffee"))
+        table.setItem(row, 1, QTableWidgetItem(f"{1 + row % 10:.2f}"))
+    return gui.commit_entries
+
+
+def wait_for_background(app, gui):
+    # (seconds until the background call is done, longest event loop stall)
+    started = last = time.perf_counter()
+    stall = 0
+    while gui.background is not None:
+        app.processEvents()
+        now = time.perf_counter()
+        stall = max(stall, now - last)
+        last = now
+        time.sleep(0.001)
+    app.processEvents()
+    return time.perf_counter() - started, stall
+
+
+def bench_paste(app, rows):
+    with tempfile.TemporaryDirectory() as base_folder:
+        tracker = DailyBudgetTracker(base_folder, YEAR, MONTH)
+        tracker.set_budget(rows * 100.0)
+        gui = BudgetTrackerGUI(tracker)
+        gui.show()
+        app.processEvents()
+        app.clipboard().setText("Category\tAmount\n" + "".join(
+            f"category {i % 50}\t{1 + i % 100:.2f}\n" for i in range(rows)))
+        gui.paste_rows()
+        parse = wait_for_background(app, gui)
+        gui.commit_pasted()
+        commit = wait_for_background(app, gui)
+        stored = len(tracker.load_transactions())
+        gui.close()
+        app.processEvents()
+    return {"parse_ms": parse[0] * 1000, "commit_ms": commit[0] * 1000,
+            "max_stall_ms": max(parse[1], commit[1]) * 1000, "stored": stored}
+
+
+def bench_size(app, size, rounds, history_months):
+    samples = {}
+    with tempfile.TemporaryDirectory() as base_folder:
+        generate_dataset(base_folder, size, YEAR, MONTH, history_months)
+        gui = BudgetTrackerGUI(DailyBudgetTracker(base_folder, YEAR, MONTH))
+        gui.show()
+        app.processEvents()
+        for i in range(rounds):
+            measure(app, samples, "show_summary_page", gui.show_summary_page)
+            measure(app, samples, "show_main_menu", gui.show_main_menu)
+            measure(app, samples, "show_expense_page", gui.show_expense_page)
+            measure(app, samples, "add_expense", submit_expense(gui, 1 + i % 10))
+            measure(app, samples, "commit_20_entries", stage_entries(gui, 20))
+            measure(app, samples, "summary_refresh", gui.show_summary_page)
+            measure(app, samples, "show_budget_page", gui.show_budget_page)
+        gui.close()
+        app.processEvents()
+    return {
+        name: {
+            "n": len(values),
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": max(values) * 1000,
+        }
+        for name, values in samples.items()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["1e3", "1e4", "1e5"])
+    parser.add_argument("--rounds", type=int, default=30, help="times each interaction is repeated")
+    parser.add_argument("--history-months", type=int, default=2)
+    parser.add_argument("--paste-rows", type=int, default=50_000, help="rows in the paste benchmark (0 skips it)")
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    expense.QMessageBox = SilentMessageBox
+    app = QApplication.instance() or QApplication([])
+
+    results = {}
+    for size in [int(float(size)) for size in args.sizes]:
+        results[str(size)] = bench_size(app, size, args.rounds, args.history_months)
+        print(f"\n{size:,} transactions")
+        print(f"{'interaction':<20} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for name, stats in results[str(size)].items():
+            print(f"{name:<20} {stats['p50_ms']:9.3f} {stats['p95_ms']:9.3f} {stats['p99_ms']:9.3f} {stats['max_ms']:9.3f}")
+
+    if args.paste_rows:
+        paste = results["paste"] = bench_paste(app, args.paste_rows)
+        print(f"\npaste {args.paste_rows:,} rows: parse={paste['parse_ms']:,.0f} ms commit={paste['commit_ms']:,.0f} ms "
+              f"longest stall={paste['max_stall_ms']:.1f} ms stored={paste['stored']:,}")
+        if paste["stored"] != args.paste_rows:
+            print(f"FAIL: {paste['stored']:,} of {args.paste_rows:,} pasted rows stored")
+            return 1
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({"platform": os.environ["QT_QPA_PLATFORM"], "results": results}, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
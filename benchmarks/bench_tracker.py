@@ -0,0 +1,186 @@
+"""Benchmark suite for the tracker engine.
+
+For each dataset size a synthetic month is generated (see datagen.py) and the
+suite times add_expense throughput, bulk import through add_expenses,
+get_expense_summary and load_budget latency, and cold (fresh interpreter,
+with and without a checkpoint snapshot) and warm (already imported) startup
+to a first summary. Results are written
+as JSON; --compare checks them against a stored baseline and exits non-zero
+when a metric regressed by more than --threshold.
+
+    python benchmarks/bench_tracker.py --sizes 1e3 1e4 1e5 --output results.json
+    python benchmarks/bench_tracker.py --compare benchmarks/baseline.json
+    python benchmarks/bench_tracker.py --sizes 1e6 1e7 --repeat 3
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from expense import DailyBudgetTracker
+from datagen import generate_dataset, generate_transactions
+
+YEAR, MONTH = 2024, 8
+COLD_START = """
+import sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+from expense import DailyBudgetTracker
+DailyBudgetTracker({base!r}, {year}, {month}).get_expense_summary()
+print(time.perf_counter() - started)
+"""
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def time_calls(func, repeat, max_seconds):
+    # At least one sample, then stop at `repeat` samples or `max_seconds`.
+    samples = []
+    deadline = time.perf_counter() + max_seconds
+    while len(samples) < repeat:
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+        if time.perf_counter() > deadline:
+            break
+    return samples
+
+
+def latency_metrics(name, samples):
+    return {
+        f"{name}_p50_ms": statistics.median(samples) * 1000,
+        f"{name}_p95_ms": percentile(samples, 0.95) * 1000,
+    }
+
+
+def cold_startup(base_folder):
+    code = COLD_START.format(root=ROOT, base=base_folder, year=YEAR, month=MONTH)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def bench_size(size, args):
+    with tempfile.TemporaryDirectory() as base_folder:
+        started = time.perf_counter()
+        generate_dataset(base_folder, size, YEAR, MONTH, args.history_months, args.seed)
+        generated = time.perf_counter() - started
+        results = {"transactions": size, "generate_seconds": generated}
+
+        results.update(latency_metrics("cold_startup", [cold_startup(base_folder) for _ in range(args.cold_repeat)]))
+        DailyBudgetTracker(base_folder, YEAR, MONTH).checkpoint()
+        results.update(latency_metrics("cold_snapshot_startup",
+                                       [cold_startup(base_folder) for _ in range(args.cold_repeat)]))
+        os.remove(DailyBudgetTracker(base_folder, YEAR, MONTH).snapshot_file)
+        results.update(latency_metrics("warm_startup", time_calls(
+            lambda: DailyBudgetTracker(base_folder, YEAR, MONTH).get_expense_summary(), args.repeat, args.max_seconds)))
+
+        tracker = DailyBudgetTracker(base_folder, YEAR, MONTH)
+        results.update(latency_metrics("load_budget", time_calls(tracker.load_budget, args.repeat * 10, args.max_seconds)))
+        results.update(latency_metrics("get_expense_summary", time_calls(
+            tracker.get_expense_summary, args.repeat, args.max_seconds)))
+
+        adds = time_calls(lambda: tracker.add_expense("coffee", 4.5), args.adds, args.max_seconds)
+        results["add_expense_ops_per_sec"] = len(adds) / sum(adds)
+        results.update(latency_metrics("add_expense", adds))
+
+        rows = [(t["category"], t["amount"])
+                for t in generate_transactions(random.Random(args.seed), YEAR, MONTH, min(size, args.bulk_rows))]
+        started = time.perf_counter()
+        tracker.add_expenses(rows)
+        results["bulk_import_rows_per_sec"] = len(rows) / (time.perf_counter() - started)
+        if tracker.checkpoint_thread is not None:
+            tracker.checkpoint_thread.join()
+    return results
+
+
+def higher_is_better(metric):
+    return metric.endswith("_per_sec")
+
+
+def compared_metric(metric):
+    # p95 of a couple of dozen samples is too noisy to gate on.
+    return metric.endswith("_p50_ms") or metric.endswith("_per_sec")
+
+
+def compare(current, baseline, threshold, min_ms):
+    regressions = []
+    for size, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            if not compared_metric(metric):
+                continue
+            reference = baseline["results"].get(size, {}).get(metric)
+            if not reference:
+                continue
+            if metric.endswith("_ms") and max(value, reference) < min_ms:
+                continue
+            change = (value - reference) / reference
+            regressed = change < -threshold if higher_is_better(metric) else change > threshold
+            flag = "REGRESSION" if regressed else ""
+            print(f"{size:>9} {metric:<32} {reference:14.3f} -> {value:14.3f} {change:+8.1%} {flag}")
+            if regressed:
+                regressions.append((size, metric, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["1e3", "1e4", "1e5"],
+                        help="transactions in the benchmarked month, e.g. 1e3 1e4 1e5 1e6 1e7")
+    parser.add_argument("--repeat", type=int, default=20, help="samples per latency metric")
+    parser.add_argument("--cold-repeat", type=int, default=3)
+    parser.add_argument("--adds", type=int, default=200, help="add_expense calls per size")
+    parser.add_argument("--bulk-rows", type=int, default=100_000)
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="time cap per latency metric")
+    parser.add_argument("--history-months", type=int, default=11)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against this results file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--min-ms", type=float, default=0.1,
+                        help="ignore latencies below this in both runs when comparing")
+    args = parser.parse_args(argv)
+
+    current = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    for size in [int(float(size)) for size in args.sizes]:
+        print(f"benchmarking {size:,} transactions...", file=sys.stderr)
+        current["results"][str(size)] = bench_size(size, args)
+
+    text = json.dumps(current, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare(current, baseline, args.threshold, args.min_ms)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
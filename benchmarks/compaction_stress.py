@@ -0,0 +1,106 @@
+"""Compaction stress test: writers keep adding while the log is folded.
+
+Runs N writer processes calling add_expense against one month while a
+Compactor in this process compacts that month as fast as it can. Afterwards
+checks that every transaction is present exactly once and that the budget
+adds up, and reports add_expense latency so stalls caused by compaction
+show up in p99/max.
+
+    python benchmarks/compaction_stress.py --processes 4 --ops 2000
+    python benchmarks/compaction_stress.py --processes 4 --ops 2000 --no-compaction
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expense import DailyBudgetTracker
+from compaction import Compactor, lower_priority
+
+
+def run_writer(base_folder, writer_id, ops, start_event, results):
+    tracker = DailyBudgetTracker(base_folder)
+    tracker.checkpoint_bytes = None
+    latencies = []
+    start_event.wait()
+    for _ in range(ops):
+        started = time.perf_counter()
+        tracker.add_expense(f"writer-{writer_id}", 1.0)
+        latencies.append(time.perf_counter() - started)
+    results.put(latencies)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=2000, help="add_expense calls per process")
+    parser.add_argument("--budget", type=float, default=1_000_000.0)
+    parser.add_argument("--no-compaction", action="store_true", help="baseline run without the compactor")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as base_folder:
+        DailyBudgetTracker(base_folder).set_budget(args.budget)
+        compactor = Compactor(base_folder, interval=0, min_log_bytes=1, log_ratio=0.0)
+        done = threading.Event()
+
+        def compact_continuously():
+            lower_priority()
+            while not done.is_set() and not args.no_compaction:
+                compactor.run_once()
+
+        start_event = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        writers = [multiprocessing.Process(target=run_writer, args=(base_folder, i, args.ops, start_event, results))
+                   for i in range(args.processes)]
+        for writer in writers:
+            writer.start()
+        compacting = threading.Thread(target=compact_continuously)
+        compacting.start()
+        started = time.perf_counter()
+        start_event.set()
+        latencies = [latency for _ in writers for latency in results.get()]
+        for writer in writers:
+            writer.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        compacting.join()
+
+        DailyBudgetTracker.cache.clear()
+        tracker = DailyBudgetTracker(base_folder)
+        transactions = tracker.load_transactions()
+        remaining = tracker.load_budget()["remaining"]
+
+    expected = args.processes * args.ops
+    per_writer = {}
+    for transaction in transactions:
+        per_writer[transaction["category"]] = per_writer.get(transaction["category"], 0) + 1
+    stats = compactor.stats()
+    print(f"processes={args.processes} ops/process={args.ops} elapsed={elapsed:.3f}s "
+          f"throughput={expected / elapsed:,.0f} ops/sec")
+    print(f"compactions={stats['compacted']} retries={stats['retries']} log_bytes_folded={stats['log_bytes_folded']} "
+          f"max_lock_hold={stats['locks']['max_hold_seconds'] * 1000:.3f}ms")
+    print(f"add_expense p50={statistics.median(latencies) * 1000:.3f}ms p99={percentile(latencies, 0.99) * 1000:.3f}ms "
+          f"max={max(latencies) * 1000:.3f}ms")
+    print(f"expected={expected} stored={len(transactions)} remaining={remaining:.2f} "
+          f"expected_remaining={args.budget - expected:.2f}")
+    if len(transactions) != expected or any(count != args.ops for count in per_writer.values()) \
+            or remaining != args.budget - expected:
+        print("FAILED: transactions lost or duplicated")
+        return 1
+    print("OK: every transaction present exactly once")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Concurrent-client load test for the tracker daemon.
+
+Starts a TrackerDaemon on a scratch data folder, hammers it with add_expense
+calls from several client processes at once and reports ops/sec. Afterwards
+the in-memory state and the files on disk are both checked for lost updates.
+
+    python benchmarks/daemon_load.py --clients 8 --ops 500
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expense import DailyBudgetTracker
+from tracker_store import TrackerStore
+from tracker_daemon import TrackerDaemon, TrackerClient
+
+
+def run_client(socket_path, client_id, ops, start_event):
+    client = TrackerClient(socket_path)
+    client.ping()
+    start_event.wait()
+    for i in range(ops):
+        client.add_expense(f"client-{client_id}", 1.0)
+        if i % 10 == 0:
+            client.get_expense_summary()
+    client.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=500, help="add_expense calls per client")
+    parser.add_argument("--budget", type=float, default=1_000_000.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as base_folder:
+        socket_path = os.path.join(base_folder, "tracker.sock")
+        server = TrackerDaemon(socket_path, TrackerStore(base_folder))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        setup = TrackerClient(socket_path)
+        setup.set_budget(args.budget)
+
+        start_event = multiprocessing.Event()
+        workers = [multiprocessing.Process(target=run_client, args=(socket_path, i, args.ops, start_event))
+                   for i in range(args.clients)]
+        for worker in workers:
+            worker.start()
+        started = time.perf_counter()
+        start_event.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        expected = args.clients * args.ops
+        in_memory = len(setup.load_transactions())
+        remaining = setup.load_budget()["remaining"]
+        setup.close()
+        server.shutdown()
+        server.server_close()
+
+        on_disk = DailyBudgetTracker(base_folder)
+        stored = len(on_disk.load_transactions())
+        stored_remaining = on_disk.load_budget()["remaining"]
+
+    print(f"clients={args.clients} ops/client={args.ops} elapsed={elapsed:.3f}s")
+    print(f"add_expense throughput: {expected / elapsed:,.0f} ops/sec")
+    print(f"expected={expected} in_memory={in_memory} on_disk={stored}")
+    print(f"remaining in_memory={remaining:.2f} on_disk={stored_remaining:.2f} expected={args.budget - expected:.2f}")
+
+    lost = expected - min(in_memory, stored)
+    if lost or remaining != args.budget - expected or stored_remaining != remaining:
+        print(f"FAILED: {lost} lost updates")
+        return 1
+    print("OK: zero lost updates")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
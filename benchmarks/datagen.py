@@ -0,0 +1,122 @@
+"""Synthetic budget_data generator for the benchmarks.
+
+Writes month folders in the tracker's on-disk format with a realistic shape:
+a Zipf-like category skew (a few categories dominate, with a long tail of
+rare ones), more spending at weekends and per-category log-normal amounts.
+
+    python benchmarks/datagen.py /tmp/budget_data --size 100000
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import calendar
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expense import DailyBudgetTracker
+
+COMMON_CATEGORIES = [
+    ("groceries", 45.0), ("coffee", 4.5), ("dining", 28.0), ("transport", 12.0),
+    ("fuel", 50.0), ("utilities", 90.0), ("shopping", 60.0), ("entertainment", 25.0),
+    ("health", 40.0), ("subscriptions", 11.0), ("rent", 1200.0), ("travel", 250.0),
+    ("gifts", 35.0), ("education", 80.0), ("pets", 30.0), ("home", 70.0),
+]
+TAIL_CATEGORIES = 200
+CHUNK_ROWS = 100_000
+
+
+def build_categories(skew=1.1):
+    categories = list(COMMON_CATEGORIES)
+    categories += [(f"misc-{i:03d}", 20.0) for i in range(TAIL_CATEGORIES)]
+    weights = [1.0 / (rank + 1) ** skew for rank in range(len(categories))]
+    return categories, weights
+
+
+def day_counts(year, month, count):
+    # Split count across the days of the month, weekends ~40% busier.
+    days = calendar.monthrange(year, month)[1]
+    weights = [1.4 if datetime.date(year, month, day).weekday() >= 5 else 1.0 for day in range(1, days + 1)]
+    total = sum(weights)
+    counts = [int(count * weight / total) for weight in weights]
+    for i in range(count - sum(counts)):
+        counts[i % days] += 1
+    return counts
+
+
+def generate_transactions(rng, year, month, count, skew=1.1):
+    categories, weights = build_categories(skew)
+    cumulative = []
+    running = 0.0
+    for weight in weights:
+        running += weight
+        cumulative.append(running)
+    for day, rows in enumerate(day_counts(year, month, count), start=1):
+        date = str(datetime.date(year, month, day))
+        for category, scale in rng.choices(categories, cum_weights=cumulative, k=rows):
+            amount = round(scale * rng.lognormvariate(0.0, 0.6), 2)
+            yield {"date": date, "category": category, "amount": amount}
+
+
+def write_month(base_folder, year, month, count, rng, skew=1.1):
+    # Streams the month straight into a compacted transactions.json so that
+    # very large sizes don't need every row in memory at once.
+    tracker = DailyBudgetTracker(base_folder, year, month)
+    tracker.create_month_folder()
+    total = 0.0
+    with open(tracker.transactions_file, 'w') as file:
+        file.write("[")
+        chunk = []
+        first = True
+        for transaction in generate_transactions(rng, year, month, count, skew):
+            total += transaction["amount"]
+            chunk.append(json.dumps(transaction))
+            if len(chunk) >= CHUNK_ROWS:
+                file.write(("" if first else ", ") + ", ".join(chunk))
+                first = False
+                chunk = []
+        if chunk:
+            file.write(("" if first else ", ") + ", ".join(chunk))
+        file.write("]")
+    budget = round(total * 1.25, 2) or 1000.0
+    tracker.write_budget({"budget": budget, "remaining": budget - total})
+    return tracker
+
+
+def previous_months(year, month, count):
+    for _ in range(count):
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+        yield year, month
+
+
+def generate_dataset(base_folder, size, year=2024, month=8, history_months=11, seed=0, skew=1.1):
+    """Writes `size` transactions into year/month plus a lighter history of
+    `history_months` earlier months (size // 20 rows each). Returns the
+    tracker for the main month."""
+    rng = random.Random(seed)
+    tracker = write_month(base_folder, year, month, size, rng, skew)
+    for history_year, history_month in previous_months(year, month, history_months):
+        write_month(base_folder, history_year, history_month, max(size // 20, 1), rng, skew)
+    return tracker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base_folder")
+    parser.add_argument("--size", type=int, default=100_000, help="transactions in the main month")
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--month", type=int, default=8)
+    parser.add_argument("--history-months", type=int, default=11)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for the category mix")
+    args = parser.parse_args(argv)
+    generate_dataset(args.base_folder, args.size, args.year, args.month, args.history_months, args.seed, args.skew)
+    print(f"Wrote {args.size} transactions for {calendar.month_name[args.month]} {args.year} "
+          f"and {args.history_months} months of history to {args.base_folder}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
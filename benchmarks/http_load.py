@@ -0,0 +1,108 @@
+"""Load generator for the tracker HTTP API.
+
+Each worker process holds one keep-alive connection and issues a mix of
+POST /expenses, POST /expenses/bulk and conditional GET /summary requests.
+Reports throughput and p50/p99 latency per endpoint. Without --url a server
+is started on a scratch data folder for the duration of the run.
+
+    python benchmarks/http_load.py --workers 8 --requests 500
+    python benchmarks/http_load.py --url http://127.0.0.1:8765
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import http.client
+import multiprocessing
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracker_store import TrackerStore
+from tracker_server import TrackerHTTPServer
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_worker(host, port, requests, bulk_size, results):
+    connection = http.client.HTTPConnection(host, port)
+    latencies = {}
+    etag = None
+    for i in range(requests):
+        headers = {"Content-Type": "application/json"}
+        if i % 4 == 3:
+            name, method, path, body = "GET /summary", "GET", "/summary", None
+            if etag:
+                headers["If-None-Match"] = etag
+        elif i % 20 == 1:
+            name, method, path = "POST /expenses/bulk", "POST", "/expenses/bulk"
+            body = json.dumps({"expenses": [{"category": "bulk", "amount": 1.0}] * bulk_size})
+        else:
+            name, method, path = "POST /expenses", "POST", "/expenses"
+            body = json.dumps({"category": f"load-{i % 7}", "amount": 1.0})
+        started = time.perf_counter()
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.setdefault(name, []).append(time.perf_counter() - started)
+        if response.status >= 400:
+            raise RuntimeError(f"{name} failed with HTTP {response.status}")
+        if method == "GET":
+            etag = response.getheader("ETag")
+    connection.close()
+    results.put(latencies)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="requests per worker")
+    parser.add_argument("--bulk-size", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    scratch = server = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        scratch = tempfile.TemporaryDirectory()
+        server = TrackerHTTPServer(("127.0.0.1", 0), TrackerStore(scratch.name))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=run_worker, args=(host, port, args.requests, args.bulk_size, results))
+               for _ in range(args.workers)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    merged = {}
+    for _ in workers:
+        for name, samples in results.get().items():
+            merged.setdefault(name, []).extend(samples)
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    if server:
+        server.shutdown()
+        server.server_close()
+        scratch.cleanup()
+
+    total = sum(len(samples) for samples in merged.values())
+    print(f"workers={args.workers} requests={total} elapsed={elapsed:.3f}s throughput={total / elapsed:,.0f} req/s")
+    for name, samples in sorted(merged.items()):
+        print(f"{name:<22} n={len(samples):<7} p50={percentile(samples, 0.50) * 1000:8.3f}ms "
+              f"p99={percentile(samples, 0.99) * 1000:8.3f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
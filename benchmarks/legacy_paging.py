@@ -0,0 +1,64 @@
+"""Paging check for months holding rows from before ids existed.
+
+Builds a month whose compacted file has id-less rows (as written by older
+versions) and whose log has newer rows, then follows next_after_id page by
+page. Every row must come back exactly once, and no page may end on an
+empty cursor.
+
+    python benchmarks/legacy_paging.py
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expense import DailyBudgetTracker
+
+YEAR, MONTH = 2024, 8
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--legacy-rows", type=int, default=10)
+    parser.add_argument("--new-rows", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as base_folder:
+        tracker = DailyBudgetTracker(base_folder, YEAR, MONTH)
+        tracker.set_budget(1_000_000.0)
+        with open(tracker.transactions_file, 'w') as file:
+            json.dump([{"date": f"{YEAR}-{MONTH:02d}-{1 + i % 28:02d}", "category": f"legacy-{i}",
+                        "amount": 1.0} for i in range(args.legacy_rows)], file)
+        for i in range(args.new_rows):
+            tracker.add_expense(f"new-{i}", 2.0)
+        DailyBudgetTracker.cache.clear()
+
+        tracker = DailyBudgetTracker(base_folder, YEAR, MONTH)
+        seen = []
+        after_id = None
+        while True:
+            rows, after_id = tracker.transactions_page(after_id, args.limit)
+            seen.extend(row["category"] for row in rows)
+            if after_id is None:
+                break
+            if not after_id:
+                print("FAIL: a page ended on an empty cursor")
+                return 1
+            if len(seen) > args.legacy_rows + args.new_rows:
+                print("FAIL: paging doesn't end")
+                return 1
+
+    expected = sorted([f"legacy-{i}" for i in range(args.legacy_rows)] + [f"new-{i}" for i in range(args.new_rows)])
+    if sorted(seen) != expected:
+        print(f"FAIL: paging returned {len(seen)} rows ({len(set(seen))} distinct), expected {len(expected)}")
+        return 1
+    print(f"OK: {len(seen)} rows paged {args.limit} at a time, each exactly once")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Multi-process write stress test for the month file lock.
+
+Spawns N processes that each run add_expense against the same month of a
+scratch data folder at the same time, then checks that every transaction
+landed and that the remaining budget adds up. Reports throughput together
+with the lock wait and contention counters collected in each process.
+
+    python benchmarks/lock_stress.py --processes 8 --ops 250
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expense import DailyBudgetTracker
+
+
+def run_writer(base_folder, writer_id, ops, start_event, results):
+    tracker = DailyBudgetTracker(base_folder)
+    start_event.wait()
+    for _ in range(ops):
+        tracker.add_expense(f"writer-{writer_id}", 1.0)
+    results.put(tracker.lock_metrics())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=250, help="add_expense calls per process")
+    parser.add_argument("--budget", type=float, default=1_000_000.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as base_folder:
+        DailyBudgetTracker(base_folder).set_budget(args.budget)
+
+        start_event = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        writers = [multiprocessing.Process(target=run_writer, args=(base_folder, i, args.ops, start_event, results))
+                   for i in range(args.processes)]
+        for writer in writers:
+            writer.start()
+        started = time.perf_counter()
+        start_event.set()
+        metrics = [results.get() for _ in writers]
+        for writer in writers:
+            writer.join()
+        elapsed = time.perf_counter() - started
+
+        tracker = DailyBudgetTracker(base_folder)
+        stored = len(tracker.load_transactions())
+        remaining = tracker.load_budget()["remaining"]
+
+    expected = args.processes * args.ops
+    acquisitions = sum(m["acquisitions"] for m in metrics)
+    contended = sum(m["contended"] for m in metrics)
+    wait = sum(m["wait_seconds"] for m in metrics)
+    print(f"processes={args.processes} ops/process={args.ops} elapsed={elapsed:.3f}s")
+    print(f"add_expense throughput: {expected / elapsed:,.0f} ops/sec")
+    print(f"lock acquisitions={acquisitions} contended={contended} ({contended / acquisitions:.1%}) "
+          f"total_wait={wait:.3f}s mean_wait={wait / acquisitions * 1e6:.1f}us "
+          f"max_wait={max(m['max_wait_seconds'] for m in metrics) * 1000:.2f}ms")
+    print(f"expected={expected} stored={stored} remaining={remaining:.2f} expected_remaining={args.budget - expected:.2f}")
+    if stored != expected or remaining != args.budget - expected:
+        print(f"FAILED: {expected - stored} lost transactions")
+        return 1
+    print("OK: no lost updates")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
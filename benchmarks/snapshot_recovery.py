@@ -0,0 +1,69 @@
+"""Checkpoint recovery check for months holding rows from before ids existed.
+
+Builds a month whose compacted file has id-less rows (as written by older
+versions) and whose log has newer rows, takes a checkpoint, and reads the
+month back cold from the snapshot. Then damages the snapshot and reads it
+back again. Both cold reads must match a full parse of the files.
+
+    python benchmarks/snapshot_recovery.py
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expense import DailyBudgetTracker
+
+YEAR, MONTH = 2024, 8
+
+
+def cold_read(base_folder):
+    DailyBudgetTracker.cache.clear()
+    tracker = DailyBudgetTracker(base_folder, YEAR, MONTH)
+    return tracker.get_expense_summary(), [row["category"] for row in tracker.load_transactions()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--legacy-rows", type=int, default=500)
+    parser.add_argument("--new-rows", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as base_folder:
+        tracker = DailyBudgetTracker(base_folder, YEAR, MONTH)
+        tracker.set_budget(1_000_000.0)
+        with open(tracker.transactions_file, 'w') as file:
+            json.dump([{"date": f"{YEAR}-{MONTH:02d}-{1 + i % 28:02d}", "category": f"legacy-{i % 7}",
+                        "amount": 1.0} for i in range(args.legacy_rows)], file)
+        for i in range(args.new_rows):
+            tracker.add_expense(f"new-{i % 3}", 2.0)
+        DailyBudgetTracker.cache.clear()
+        expected = cold_read(base_folder)
+
+        DailyBudgetTracker(base_folder, YEAR, MONTH).checkpoint()
+        if not os.path.exists(tracker.snapshot_file):
+            print("FAIL: no snapshot written")
+            return 1
+        failures = 0
+        if cold_read(base_folder) != expected:
+            print("FAIL: month read from the snapshot differs from a full parse")
+            failures += 1
+
+        with open(tracker.snapshot_file, 'r+b') as file:
+            file.seek(os.path.getsize(tracker.snapshot_file) // 2)
+            file.write(b"\xff" * 64)
+        if cold_read(base_folder) != expected:
+            print("FAIL: month read past a damaged snapshot differs from a full parse")
+            failures += 1
+
+    if failures:
+        return 1
+    print(f"OK: {args.legacy_rows} id-less and {args.new_rows} new rows recovered from the snapshot")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""Category canonicalization: map typed categories onto existing ones.
+
+Category strings drift ("Coffee", "coffee ", "cofee"), which splits summary
+totals. CategoryIndex keeps every known category and maps new input onto the
+existing spelling: always when they differ only in case and spacing, and,
+when fuzzy matching is asked for, also when the input is a misspelling of it
+(a few edits apart, never just a prefix). Input that matches nothing becomes
+a new category. Results are cached per input string. DailyBudgetTracker runs
+every category through the index of its data folder, which is persisted as
+categories.jsonl; it merges misspellings only when fuzzy_categories is set
+(BUDGET_TRACKER_FUZZY_CATEGORIES=1).
+
+The renormalize command rewrites history: it ranks every category ever used
+by how often it appears, maps each onto a more common spelling it is a
+misspelling of, and rewrites the months whose categories changed. Amounts
+and budgets are left alone. Check the --dry-run list before running it.
+
+    python categories.py renormalize --dry-run
+    python categories.py renormalize
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+from collections import Counter
+
+from file_lock import FileLock
+from month_cache import MISSING
+
+THRESHOLD = 0.6
+CACHE_SIZE = 65536
+
+
+def normalize_category(text):
+    return " ".join(text.casefold().split())
+
+
+def digits(key):
+    return "".join(char for char in key if char.isdigit())
+
+
+def trigrams(key):
+    padded = "  " + key + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(length):
+    # Typos allowed in a name this long: none below five characters, where
+    # one letter is usually a different word (bus, bug), then one, then two.
+    return 0 if length < 5 else 1 if length < 10 else 2
+
+
+def edit_distance(a, b, limit):
+    # Edits (insert, delete, replace, swap neighbours) from a to b, or
+    # limit + 1 once it is certain to be more than limit.
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other))
+            if i > 1 and j > 1 and char == b[j - 2] and a[i - 2] == other:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def is_typo(key, candidate):
+    # Whether key is a misspelling of candidate rather than another word.
+    # A prefix never is: "tax" and "taxi", "pet" and "petrol" differ.
+    if key.startswith(candidate) or candidate.startswith(key) or digits(key) != digits(candidate):
+        return False
+    limit = max_edits(min(len(key), len(candidate)))
+    return limit > 0 and edit_distance(key, candidate, limit) <= limit
+
+
+class CategoryIndex:
+    # Known categories by normalized key. Exact lookups ignore only case and
+    # spacing. Fuzzy lookups also accept a misspelling: candidates sharing
+    # enough trigrams (Dice coefficient at or above threshold, through a
+    # trigram -> keys posting list) are confirmed by edit distance, and the
+    # most similar confirmed one wins.
+    def __init__(self, names=(), threshold=THRESHOLD):
+        self.threshold = threshold
+        self.names = {}
+        self.sizes = {}
+        self.postings = {}
+        self.cache = {}
+        self.lock = threading.Lock()
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        key = normalize_category(name)
+        if not key or key in self.names:
+            return
+        grams = trigrams(key)
+        self.names[key] = name.strip()
+        self.sizes[key] = len(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(key)
+        # A new category can be a better match for inputs seen before.
+        self.cache.clear()
+
+    def lookup(self, text, fuzzy=True):
+        # The existing category text stands for, or None.
+        key = normalize_category(text)
+        if key in self.names:
+            return self.names[key]
+        if not fuzzy:
+            return None
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        best, best_score = None, self.threshold
+        for candidate, count in shared.items():
+            score = 2 * count / (len(grams) + self.sizes[candidate])
+            if score < best_score or (best is not None and score == best_score):
+                continue
+            if is_typo(key, candidate):
+                best, best_score = candidate, score
+        return self.names[best] if best is not None else None
+
+    def canonical(self, text, fuzzy=False):
+        with self.lock:
+            cached = self.cache.get((text, fuzzy), MISSING)
+            if cached is not MISSING:
+                return cached
+            name = self.lookup(text, fuzzy)
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.clear()
+            self.cache[(text, fuzzy)] = name
+            return name
+
+    def __len__(self):
+        return len(self.names)
+
+
+class CategoryStore:
+    # The CategoryIndex of one data folder, persisted as categories.jsonl
+    # (one JSON string per line, appended as categories appear) and shared
+    # by every process using the folder.
+    def __init__(self, base_folder, threshold=THRESHOLD):
+        self.base_folder = base_folder
+        self.path = os.path.join(base_folder, "categories.jsonl")
+        self.lock_path = os.path.join(base_folder, ".categories.lock")
+        self.index = CategoryIndex(threshold=threshold)
+        self.identity = None
+        self.offset = 0
+        self.guard = threading.Lock()
+
+    def refresh(self):
+        # Picks up categories other processes added since the last call.
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if not self.seed():
+                return
+            st = os.stat(self.path)
+        with self.guard:
+            if (st.st_dev, st.st_ino) != self.identity or st.st_size < self.offset:
+                self.index = CategoryIndex(threshold=self.index.threshold)
+                self.identity = (st.st_dev, st.st_ino)
+                self.offset = 0
+            if st.st_size == self.offset:
+                return
+            with open(self.path, 'rb') as file:
+                file.seek(self.offset)
+                data = file.read()
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                self.index.add(json.loads(line))
+            self.offset += end
+
+    def seed(self):
+        # Writes categories.jsonl for a folder that has none yet: every
+        # category already in the month files, most used spelling first, so
+        # history is matched like anything added later. Returns whether the
+        # file exists now.
+        from expense import DailyBudgetTracker, month_keys
+
+        months = month_keys(self.base_folder)
+        if not months:
+            return False
+        with FileLock(self.lock_path):
+            if os.path.exists(self.path):
+                return True
+            usage = Counter()
+            for year, month in months:
+                for part in DailyBudgetTracker(self.base_folder, year, month).load_columns():
+                    usage.update(part.totals_copy()[1])
+            names = [name for name, count in sorted(usage.items(), key=lambda item: (-item[1], item[0])) if count]
+            temp_path = f"{self.path}.{os.getpid()}.{threading.get_native_id()}.tmp"
+            with open(temp_path, 'wb') as file:
+                file.write("".join(json.dumps(name) + "\n" for name in names).encode())
+            os.replace(temp_path, self.path)
+        return True
+
+    def canonical(self, category, fuzzy=False):
+        # The existing spelling of category, adding it as a new category
+        # when nothing close enough exists yet.
+        name = self.index.canonical(category, fuzzy)
+        if name is not None:
+            return name
+        self.refresh()
+        name = self.index.canonical(category, fuzzy)
+        if name is not None:
+            return name
+        os.makedirs(self.base_folder, exist_ok=True)
+        with FileLock(self.lock_path):
+            self.refresh()
+            name = self.index.canonical(category, fuzzy)
+            if name is not None:
+                return name
+            name = category.strip()
+            if not name:
+                return category
+            with open(self.path, 'ab') as file:
+                file.write((json.dumps(name) + "\n").encode())
+            self.refresh()
+        return name
+
+    def replace(self, names):
+        # Rewrites categories.jsonl with exactly these names.
+        os.makedirs(self.base_folder, exist_ok=True)
+        with FileLock(self.lock_path):
+            temp_path = f"{self.path}.{os.getpid()}.{threading.get_native_id()}.tmp"
+            with open(temp_path, 'wb') as file:
+                file.write("".join(json.dumps(name) + "\n" for name in names).encode())
+            os.replace(temp_path, self.path)
+        self.refresh()
+
+
+stores = {}
+stores_lock = threading.Lock()
+
+
+def store_for(base_folder):
+    path = os.path.abspath(base_folder)
+    with stores_lock:
+        store = stores.get(path)
+        if store is None:
+            store = stores[path] = CategoryStore(base_folder)
+        return store
+
+
+def renormalize(base_folder, dry_run=False, threshold=THRESHOLD):
+    # Returns ({old: new} for every category that changes, months rewritten).
+    from expense import DailyBudgetTracker, month_keys
+
+    usage = Counter()
+    for year, month in month_keys(base_folder):
+        for transaction in DailyBudgetTracker(base_folder, year, month).load_transactions():
+            usage[transaction["category"]] += 1
+    # Most used first, so the common spelling is the one others map onto.
+    index = CategoryIndex(threshold=threshold)
+    mapping = {}
+    for name, _ in sorted(usage.items(), key=lambda item: (-item[1], item[0])):
+        canonical = index.lookup(name)
+        if canonical is None:
+            index.add(name)
+            canonical = name.strip()
+        if canonical != name:
+            mapping[name] = canonical
+    rewritten = []
+    if dry_run:
+        return mapping, rewritten
+    for year, month in month_keys(base_folder):
+        tracker = DailyBudgetTracker(base_folder, year, month)
+        tracker.canonicalize = False
+        with tracker.month_lock():
+            transactions = tracker.load_transactions()
+            if not any(transaction["category"] in mapping for transaction in transactions):
+                continue
+            for transaction in transactions:
+                transaction["category"] = mapping.get(transaction["category"], transaction["category"])
+            tracker.write_transactions(transactions)
+            tracker.write_snapshot()
+        rewritten.append((year, month))
+    store_for(base_folder).replace(index.names.values())
+    return mapping, rewritten
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["renormalize"])
+    parser.add_argument("--base-folder", default="budget_data")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="trigram similarity a misspelling needs before its edits are counted")
+    parser.add_argument("--dry-run", action="store_true", help="list the changes without rewriting anything")
+    args = parser.parse_args(argv)
+
+    mapping, rewritten = renormalize(args.base_folder, args.dry_run, args.threshold)
+    for old, new in sorted(mapping.items()):
+        print(f"{old!r} -> {new!r}")
+    if args.dry_run:
+        print(f"Dry run: {len(mapping)} categories would be merged.")
+    else:
+        print(f"{len(mapping)} categories merged, {len(rewritten)} months rewritten.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
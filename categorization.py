@@ -0,0 +1,221 @@
+import re
+import sys
+import json
+from collections import deque
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from fingerprints import normalize_description
+
+# Rule index meaning "nothing matched"; any real rule sorts before it.
+NO_MATCH = sys.maxsize
+# Inline flags, which only work at the start of a pattern; a pattern with
+# them (or with groups, whose numbers would shift) is tried on its own
+# rather than inside the combined alternation.
+INLINE_FLAGS = re.compile(r"\(\?[aiLmsux-]")
+
+
+class Rule:
+    __slots__ = ("keyword", "regex", "category")
+
+    def __init__(self, category, keyword=None, regex=None):
+        if (keyword is None) == (regex is None):
+            raise ValueError("A rule needs exactly one of keyword and regex")
+        if not category:
+            raise ValueError("A rule needs a category")
+        self.keyword = keyword
+        self.regex = regex
+        self.category = category
+
+
+def required_literal(pattern):
+    # The longest run of characters that every match of pattern contains,
+    # lowercased; "" when there is none worth indexing.
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return ""
+    best = current = ""
+    for op, argument in parsed:
+        if op is sre_parse.LITERAL:
+            current += chr(argument)
+        elif op is not sre_parse.AT:
+            # Anchors and boundaries take no characters; anything else
+            # breaks the run.
+            best = max(best, current, key=len)
+            current = ""
+    best = max(best, current, key=len)
+    return best.casefold() if len(best) >= 2 else ""
+
+
+def load_rules(path):
+    # category_rules.json: a list of {"keyword": ..., "category": ...} or
+    # {"regex": ..., "category": ...}, most specific first.
+    with open(path, 'r', encoding='utf-8') as file:
+        entries = json.load(file)
+    try:
+        return [Rule(entry["category"], entry.get("keyword"), entry.get("regex")) for entry in entries]
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError(f"{path}: every rule needs a category and a keyword or regex")
+
+
+class AhoCorasick:
+    # All words matched in a single pass over the text. Words added as exact
+    # matches report only the lowest value found, which each node keeps for
+    # the words ending there or at a suffix of it; the others ("hints")
+    # report every value found.
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [NO_MATCH]
+        self.outputs = [()]
+
+    def add(self, word, value, exact=True):
+        node = 0
+        for char in word:
+            child = self.goto[node].get(char)
+            if child is None:
+                child = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.best.append(NO_MATCH)
+                self.outputs.append(())
+                self.goto[node][char] = child
+            node = child
+        if exact:
+            self.best[node] = min(self.best[node], value)
+        else:
+            self.outputs[node] += (value,)
+
+    def build(self):
+        goto, fail, best = self.goto, self.fail, self.best
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fallback = goto[state].get(char, 0)
+                fail[child] = fallback if fallback != child else 0
+                best[child] = min(best[child], best[fail[child]])
+                if self.outputs[fail[child]]:
+                    self.outputs[child] += self.outputs[fail[child]]
+                queue.append(child)
+
+    def scan(self, text):
+        # (lowest exact value found or NO_MATCH, set of hint values found)
+        goto, fail, bests, outputs = self.goto, self.fail, self.best, self.outputs
+        node = 0
+        best = NO_MATCH
+        hints = set()
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if bests[node] < best:
+                best = bests[node]
+            if outputs[node]:
+                hints.update(outputs[node])
+        return best, hints
+
+
+class Categorizer:
+    # Picks a category for a payee or statement description from an ordered
+    # list of rules: the first rule that matches wins, exactly as if they
+    # were tried one by one. Keywords match whole-text substrings ignoring
+    # case, punctuation and spacing; regexes are searched case-insensitively
+    # in the raw text. Keywords go into one Aho-Corasick automaton, and so
+    # does the literal that every match of a regex must contain, if it has
+    # one; that regex is only tried when its literal turns up. The remaining
+    # regexes share one combined alternation. A description is therefore
+    # scanned about twice however many rules there are. Results are cached per description,
+    # since statements repeat the same payees.
+    def __init__(self, rules, cache_size=65536):
+        self.rules = list(rules)
+        self.words = AhoCorasick()
+        self.patterns = {}
+        self.regexes = []
+        self.alone = []
+        alternatives = []
+        for index, rule in enumerate(self.rules):
+            if rule.keyword is not None:
+                keyword = normalize_description(rule.keyword)
+                if keyword:
+                    self.words.add(keyword, index)
+                continue
+            try:
+                regex = re.compile(rule.regex, re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"Rule {index + 1}: invalid regex {rule.regex!r}: {e}")
+            # Normalized like the text it is looked for in; a literal in the
+            # raw text always survives as its normalized form.
+            literal = normalize_description(required_literal(rule.regex))
+            if len(literal) >= 2:
+                self.words.add(literal, index, exact=False)
+                self.patterns[index] = regex
+                continue
+            self.regexes.append((index, regex))
+            if regex.groups or INLINE_FLAGS.search(rule.regex):
+                self.alone.append((index, regex))
+            else:
+                alternatives.append((index, f"(?P<r{index}>{rule.regex})"))
+        self.words.build()
+        self.combined = self.combine(alternatives) if alternatives else None
+        self.cache = {}
+        self.cache_size = cache_size
+
+    @staticmethod
+    def combine(alternatives):
+        try:
+            return re.compile("|".join(pattern for _, pattern in alternatives), re.IGNORECASE)
+        except re.error as e:
+            for index, pattern in alternatives:
+                try:
+                    re.compile(f"{pattern}|", re.IGNORECASE)
+                except re.error as error:
+                    raise ValueError(f"Rule {index + 1}: regex can't be combined with the others: {error}")
+            raise ValueError(f"Regex rules can't be combined: {e}")
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load_rules(path))
+
+    def match(self, description):
+        # Index of the first matching rule, or NO_MATCH.
+        best, hints = self.words.scan(normalize_description(description))
+        if hints:
+            for index in sorted(hints):
+                if index >= best:
+                    break
+                if self.patterns[index].search(description):
+                    best = index
+                    break
+        found = self.combined.search(description) if self.combined is not None else None
+        if found is not None:
+            # The alternation reports the leftmost match, which need not be
+            # the earliest rule; only regex rules before it still need a look.
+            best = min(best, int(found.lastgroup[1:]))
+            candidates = self.regexes
+        else:
+            candidates = self.alone
+        for index, regex in candidates:
+            if index >= best:
+                break
+            if regex.search(description):
+                return index
+        return best
+
+    def categorize(self, description, default=None):
+        category = self.cache.get(description)
+        if category is None:
+            index = self.match(description)
+            category = self.rules[index].category if index != NO_MATCH else ""
+            if self.cache_size:
+                if len(self.cache) >= self.cache_size:
+                    self.cache.clear()
+                self.cache[description] = category
+        return category or default
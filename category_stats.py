@@ -0,0 +1,252 @@
+import os
+import json
+import math
+import time
+import threading
+
+from file_lock import FileLock
+
+# A use counts half as much after this many days.
+HALF_LIFE_DAYS = 30
+SUGGESTIONS = 10
+COMPACT_BYTES = 256 * 1024
+UNUSED = float("-inf")
+
+
+def use_rank(day, half_life=HALF_LIFE_DAYS):
+    # A category's rank is log(sum of 2 ** (day / half_life) over its uses):
+    # every use decays at the same rate, so ranks compare correctly without
+    # ever being recomputed, and a new use only ever raises a rank.
+    return day * math.log(2) / half_life
+
+
+def add_use(rank, day, half_life=HALF_LIFE_DAYS, uses=1):
+    use = use_rank(day, half_life) + math.log(uses)
+    if rank == UNUSED:
+        return use
+    high, low = max(rank, use), min(rank, use)
+    return high + math.log1p(math.exp(low - high))
+
+
+class Node:
+    # A leaf lists every category below it (at most limit of them, except
+    # at the end of a name); an inner node keeps the best limit below it,
+    # best first, and its children by next character, "" for names that
+    # end here.
+    __slots__ = ("children", "best")
+
+    def __init__(self):
+        self.children = None
+        self.best = []
+
+
+class CategoryTrie:
+    # Burst trie over casefolded category names. A leaf splits into children
+    # once more than `limit` names share it, so nodes stay few even with
+    # tens of thousands of long names. Completing a prefix walks at most
+    # len(prefix) nodes and then copies one short list, or filters a leaf's.
+    # Ranks only go up, so a name pushed out of an inner node's list never
+    # belongs back in it, and updates only need to walk one path.
+    def __init__(self, limit=SUGGESTIONS):
+        self.limit = limit
+        self.root = Node()
+        self.ranks = {}
+
+    def update(self, name, rank):
+        # Adds name, or moves it up to rank.
+        previous = self.ranks.get(name)
+        if previous is not None and rank <= previous:
+            return
+        self.ranks[name] = rank
+        key = name.casefold()
+        node, depth = self.root, 0
+        while node.children is not None:
+            self.promote(node.best, name, rank)
+            char = key[depth] if depth < len(key) else ""
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = Node()
+            node, depth = child, depth + 1
+        if previous is None:
+            node.best.append(name)
+            if len(node.best) > self.limit and depth <= len(key):
+                self.burst(node, depth)
+
+    def burst(self, node, depth):
+        names = node.best
+        node.children = {}
+        for name in names:
+            key = name.casefold()
+            char = key[depth] if depth < len(key) else ""
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = Node()
+            child.best.append(name)
+        node.best = self.ranked(names)
+        for char, child in node.children.items():
+            if char and len(child.best) > self.limit:
+                self.burst(child, depth + 1)
+
+    def ranked(self, names):
+        ranks = self.ranks
+        return sorted(names, key=lambda name: -ranks[name])[:self.limit]
+
+    def promote(self, best, name, rank):
+        ranks = self.ranks
+        if name in best:
+            best.remove(name)
+        elif len(best) >= self.limit and rank <= ranks[best[-1]]:
+            return
+        # Short list: a linear scan beats bisect with a key.
+        position = 0
+        while position < len(best) and ranks[best[position]] >= rank:
+            position += 1
+        best.insert(position, name)
+        del best[self.limit:]
+
+    def complete(self, prefix):
+        key = prefix.casefold()
+        node, depth = self.root, 0
+        while node.children is not None:
+            if depth == len(key):
+                return list(node.best)
+            node = node.children.get(key[depth])
+            if node is None:
+                return []
+            depth += 1
+        return self.ranked([name for name in node.best if name.casefold().startswith(key)])
+
+    def __len__(self):
+        return len(self.ranks)
+
+
+class CategoryStats:
+    # Recency-weighted category usage for one data folder, kept in a
+    # CategoryTrie for completion. Uses are appended to category_stats.jsonl
+    # as expenses are stored, by whichever process stores them, one line per
+    # batch; once compact_bytes of them pile up after the last rewrite, the
+    # file is rewritten as a single line of ranks. Known categories without
+    # recorded uses still complete, after the used ones.
+    def __init__(self, base_folder="budget_data", half_life=HALF_LIFE_DAYS, now=time.time,
+                 compact_bytes=COMPACT_BYTES):
+        self.base_folder = base_folder
+        self.path = os.path.join(base_folder, "category_stats.jsonl")
+        self.lock_path = os.path.join(base_folder, ".category_stats.lock")
+        self.half_life = half_life
+        self.now = now
+        self.compact_bytes = compact_bytes
+        self.trie = CategoryTrie()
+        self.names = set()
+        self.identity = None
+        self.offset = 0
+        self.ranks_size = 0
+        self.lock = threading.Lock()
+
+    def today(self):
+        return self.now() / 86400
+
+    def load(self, names=()):
+        # Ranks from the stats file, then any other known category.
+        self.refresh()
+        with self.lock:
+            self.names.update(names)
+            for name in names:
+                self.trie.update(name, UNUSED)
+        return self
+
+    def refresh(self):
+        # Folds in the uses appended since the last call, by any process.
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        with self.lock:
+            rewritten = (st.st_dev, st.st_ino) != self.identity or st.st_size < self.offset
+            if rewritten:
+                # The new file holds everything, so start over.
+                self.trie = CategoryTrie()
+                self.identity = (st.st_dev, st.st_ino)
+                self.offset = 0
+                self.ranks_size = 0
+            if st.st_size == self.offset and not rewritten:
+                return
+            with open(self.path, 'rb') as file:
+                file.seek(self.offset)
+                data = file.read()
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].split(b"\n")[:-1]:
+                self.offset += len(line) + 1
+                try:
+                    entry = json.loads(line)
+                    self.apply(entry)
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    continue
+                if "ranks" in entry:
+                    self.ranks_size = self.offset
+            if rewritten:
+                for name in self.names:
+                    self.trie.update(name, UNUSED)
+
+    def apply(self, entry):
+        ranks = self.trie.ranks
+        if "ranks" in entry:
+            if entry.get("half_life") == self.half_life:
+                for name, rank in entry["ranks"].items():
+                    self.trie.update(name, float(rank))
+            return
+        day = float(entry["day"])
+        for name, uses in entry["uses"].items():
+            self.trie.update(name, add_use(ranks.get(name, UNUSED), day, self.half_life, uses))
+
+    def record(self, uses):
+        # uses: {category: number of uses} for one batch of stored expenses.
+        uses = {name: count for name, count in uses.items() if count > 0}
+        if not uses:
+            return
+        entry = {"day": self.today(), "uses": uses}
+        data = (json.dumps(entry) + "\n").encode()
+        os.makedirs(self.base_folder, exist_ok=True)
+        with FileLock(self.lock_path):
+            with open(self.path, 'ab') as file:
+                start = file.tell()
+                file.write(data)
+                st = os.fstat(file.fileno())
+            with self.lock:
+                # Nothing else appended since the last refresh, so there's
+                # no need to read back what was just written.
+                current = (st.st_dev, st.st_ino) == self.identity and start == self.offset
+                if current:
+                    self.apply(entry)
+                    self.offset += len(data)
+            if not current:
+                self.refresh()
+            if self.offset - self.ranks_size > self.compact_bytes:
+                self.compact()
+
+    def compact(self):
+        # Callers must hold the file lock and have just refreshed.
+        with self.lock:
+            ranks = {name: rank for name, rank in self.trie.ranks.items() if rank != UNUSED}
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_native_id()}.tmp"
+        with open(temp_path, 'w') as file:
+            file.write(json.dumps({"half_life": self.half_life, "ranks": ranks}) + "\n")
+        os.replace(temp_path, self.path)
+        self.refresh()
+
+    def complete(self, prefix):
+        self.refresh()
+        with self.lock:
+            return self.trie.complete(prefix)
+
+
+stats = {}
+stats_lock = threading.Lock()
+
+
+def stats_for(base_folder):
+    path = os.path.abspath(base_folder)
+    with stats_lock:
+        found = stats.get(path)
+        if found is None:
+            found = stats[path] = CategoryStats(base_folder)
+        return found
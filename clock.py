@@ -0,0 +1,31 @@
+import datetime
+import threading
+
+
+class SystemClock:
+    def today(self):
+        return datetime.date.today()
+
+
+class ManualClock:
+    # A clock that only moves when told to, for scripts and benchmarks that
+    # need to cross a month boundary without waiting for one.
+    def __init__(self, date=None):
+        self.date = date or datetime.date.today()
+        self.lock = threading.Lock()
+
+    def today(self):
+        with self.lock:
+            return self.date
+
+    def set(self, date):
+        with self.lock:
+            self.date = date
+
+    def advance(self, days=1):
+        with self.lock:
+            self.date += datetime.timedelta(days=days)
+            return self.date
+
+
+SYSTEM_CLOCK = SystemClock()
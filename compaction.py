@@ -0,0 +1,129 @@
+import os
+import threading
+
+from clock import SYSTEM_CLOCK
+from expense import DailyBudgetTracker, month_keys
+from file_lock import LockStats
+
+def lower_priority(increment=10):
+    # On Linux each thread has its own nice value, so this only demotes the
+    # calling thread. Elsewhere it is a no-op rather than slowing the whole
+    # process down.
+    try:
+        tid = threading.get_native_id()
+        os.setpriority(os.PRIO_PROCESS, tid, os.getpriority(os.PRIO_PROCESS, tid) + increment)
+    except (AttributeError, OSError):
+        pass
+
+
+class Compactor:
+    # Background housekeeping for the month folders. The current month is
+    # compacted once its log is large, or large relative to transactions.json;
+    # finished months are sealed (date-ordered, with summary.json and a
+    # snapshot) whenever they have a log or no valid summary. With
+    # carry_forward, last month's unspent budget is then added to this month,
+    # once. Compaction never
+    # holds a month lock for longer than a rename, so it doesn't hold up
+    # add_expense.
+    def __init__(self, base_folder="budget_data", interval=60.0, min_log_bytes=256 * 1024,
+                 log_ratio=0.25, max_log_bytes=8 * 1024 * 1024, clock=None,
+                 carry_forward=False):
+        self.base_folder = base_folder
+        self.interval = interval
+        self.min_log_bytes = min_log_bytes
+        self.log_ratio = log_ratio
+        self.max_log_bytes = max_log_bytes
+        self.clock = clock or SYSTEM_CLOCK
+        self.carry_forward = carry_forward
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.runs = 0
+        self.compacted = 0
+        self.sealed = 0
+        self.carried_forward = 0
+        self.retries = 0
+        self.log_bytes_folded = 0
+        self.last_error = None
+        # Shared by every month it touches, so max_hold_seconds shows the
+        # longest time compaction kept writers waiting.
+        self.lock_stats = LockStats()
+
+    def needs_compaction(self, tracker):
+        log_bytes = os.path.getsize(tracker.log_file) if os.path.exists(tracker.log_file) else 0
+        if log_bytes < self.min_log_bytes:
+            return False
+        base_bytes = os.path.getsize(tracker.transactions_file) if os.path.exists(tracker.transactions_file) else 0
+        return log_bytes >= self.max_log_bytes or log_bytes >= self.log_ratio * (base_bytes + log_bytes)
+
+    def needs_sealing(self, tracker):
+        if not (os.path.exists(tracker.transactions_file) or os.path.exists(tracker.log_file)):
+            return False
+        return tracker.load_summary() is None
+
+    def run_once(self):
+        # Returns the (year, month, action) of everything it did.
+        today = self.clock.today()
+        last_month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+        actions = []
+        for year, month in month_keys(self.base_folder):
+            if self.stop_event.is_set():
+                break
+            tracker = DailyBudgetTracker(self.base_folder, year, month)
+            tracker.lock_stats = self.lock_stats
+            if (year, month) >= (today.year, today.month):
+                if not self.needs_compaction(tracker):
+                    continue
+                log_bytes = os.path.getsize(tracker.log_file)
+                if tracker.compact():
+                    self.compacted += 1
+                    self.log_bytes_folded += log_bytes
+                    actions.append((year, month, "compacted"))
+                else:
+                    self.retries += 1
+                continue
+            if self.needs_sealing(tracker):
+                tracker.seal()
+                self.sealed += 1
+                actions.append((year, month, "sealed"))
+            if self.carry_forward and (year, month) == last_month:
+                following = DailyBudgetTracker(self.base_folder, today.year, today.month)
+                following.lock_stats = self.lock_stats
+                if tracker.carry_forward_to(following):
+                    self.carried_forward += 1
+                    actions.append((year, month, "carried forward"))
+        self.runs += 1
+        return actions
+
+    def loop(self):
+        lower_priority()
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except (OSError, ValueError) as e:
+                # A month that can't be compacted now (e.g. a file removed
+                # by hand mid-run) is retried on the next pass.
+                self.last_error = e
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.loop, name="compactor", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def stats(self):
+        return {
+            "runs": self.runs,
+            "compacted": self.compacted,
+            "sealed": self.sealed,
+            "carried_forward": self.carried_forward,
+            "retries": self.retries,
+            "log_bytes_folded": self.log_bytes_folded,
+            "last_error": str(self.last_error) if self.last_error else None,
+            "locks": self.lock_stats.as_dict(),
+        }
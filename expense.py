@@ -3,76 +3,639 @@ import os
 import json
 import calendar
 import datetime
+import threading
+from collections import Counter
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QPushButton, QLabel, QLineEdit, QComboBox, 
                              QMessageBox, QStackedWidget, QHBoxLayout, 
-                             QGridLayout, QProgressBar)
-from PyQt6.QtGui import QFont, QColor, QIcon
-from PyQt6.QtCore import Qt
+                             QGridLayout, QProgressBar, QCompleter, QTableWidget,
+                             QTableWidgetItem, QAbstractItemView, QHeaderView,
+                             QStyledItemDelegate, QTableView)
+from PyQt6.QtGui import QFont, QColor, QIcon, QBrush, QKeySequence, QShortcut
+from PyQt6.QtCore import (Qt, pyqtSlot, pyqtSignal, QObject, QStringListModel, QAbstractTableModel,
+                          QModelIndex)
 from PyQt6.QtWidgets import QProgressBar
 
+from clock import SYSTEM_CLOCK
+from file_lock import FileLock, LockStats
+from tracker_pool import TrackerPool
+from month_cache import (FileCache, TransactionColumns, MISSING, file_signature, merged_rows, merged_totals,
+                         merged_page)
+from transaction_ids import new_id, floor_id, timestamp_ms
+from idempotency import index_for
+from categories import store_for
+from category_stats import stats_for
+from pasted_rows import parse_pasted
+import snapshot
+import tracing
+import instrumentation
+from instrumentation import timed, record_io
+
+MONTHS = {name: number for number, name in enumerate(calendar.month_name) if name}
+
+def month_keys(base_folder):
+    # (year, month) of every month folder (see current_folder), oldest first.
+    found = []
+    for name in os.listdir(base_folder) if os.path.isdir(base_folder) else []:
+        year, _, month_name = name.partition("_")
+        if year.isdigit() and month_name in MONTHS:
+            found.append((int(year), MONTHS[month_name]))
+    return sorted(found)
+
 class DailyBudgetTracker:
-    def __init__(self):
-        self.base_folder = "budget_data"
-        self.current_date = datetime.date.today()
-        self.current_year = self.current_date.year
-        self.current_month = self.current_date.month
+    # Parsed month files, shared by every tracker in the process.
+    cache = FileCache()
+    # Map typed categories onto the existing spelling (see categories.py):
+    # case and spacing always, misspellings only when asked for.
+    canonicalize = True
+    fuzzy_categories = bool(os.environ.get("BUDGET_TRACKER_FUZZY_CATEGORIES"))
+
+    def __init__(self, base_folder="budget_data", year=None, month=None, clock=None):
+        self.base_folder = base_folder
+        self.clock = clock or SYSTEM_CLOCK
+        self.current_date = self.clock.today()
+        # Without an explicit month the tracker follows the clock into each
+        # new month, sealing the one it leaves (see refresh_date).
+        self.follows_clock = year is None and month is None
+        # Set carry_forward to add a sealed month's unspent budget to the next.
+        self.carry_forward = False
+        self.rollover_thread = None
+        # A checkpoint is written in the background once the log has grown
+        # this many bytes past the last one; None turns that off.
+        self.checkpoint_bytes = 1 << 20
+        self.checkpoint_thread = None
+        self.lock_stats = LockStats()
+        # Set fsync to make every write durable before it returns.
+        self.fsync = False
+        self.fsync_count = 0
+        self.select_month(year or self.current_date.year, month or self.current_date.month)
+
+    def select_month(self, year, month):
+        self.current_year = year
+        self.current_month = month
         self.current_month_name = calendar.month_name[self.current_month]
         self.current_folder = os.path.join(self.base_folder, f"{self.current_year}_{self.current_month_name}")
         self.transactions_file = os.path.join(self.current_folder, "transactions.json")
+        self.log_file = os.path.join(self.current_folder, "transactions.jsonl")
         self.budget_file = os.path.join(self.current_folder, "budget.json")
+        self.lock_file = os.path.join(self.current_folder, ".lock")
+        self.summary_file = os.path.join(self.current_folder, "summary.json")
+        self.snapshot_file = os.path.join(self.current_folder, "snapshot.bin")
+        self.checkpointed_offset = None
+
+    def refresh_date(self):
+        # Called before every write and month-level read, so entries are
+        # dated when they are made rather than when the tracker was created.
+        today = self.clock.today()
+        self.current_date = today
+        if self.follows_clock and (today.year, today.month) != (self.current_year, self.current_month):
+            finished = (self.current_year, self.current_month)
+            self.select_month(today.year, today.month)
+            self.start_rollover(finished)
+
+    def start_rollover(self, finished):
+        # Sealing rewrites the whole finished month, so it runs off the
+        # caller's thread; the next entry only needs the new month's lock.
+        self.rollover_thread = threading.Thread(
+            target=self.seal_finished_month, args=(finished, (self.current_year, self.current_month)),
+            name="month-rollover", daemon=True)
+        self.rollover_thread.start()
+
+    def seal_finished_month(self, finished, current):
+        previous = DailyBudgetTracker(self.base_folder, *finished)
+        previous.fsync = self.fsync
+        previous.seal()
+        if self.carry_forward:
+            following = DailyBudgetTracker(self.base_folder, *current)
+            following.fsync = self.fsync
+            previous.carry_forward_to(following)
+
+    def wait_for_rollover(self, timeout=None):
+        if self.rollover_thread is not None:
+            self.rollover_thread.join(timeout)
 
     def create_month_folder(self):
         os.makedirs(self.current_folder, exist_ok=True)
 
-    def set_budget(self, amount):
+    def month_lock(self):
+        # Held by every writer of this month, in this or any other process.
+        # Keep the critical section to the append and the budget update.
         self.create_month_folder()
+        return FileLock(self.lock_file, self.lock_stats)
+
+    def lock_metrics(self):
+        return self.lock_stats.as_dict()
+
+    def stats(self):
+        return {"spans": instrumentation.stats(), "locks": self.lock_metrics(), "cache": self.cache.stats()}
+
+    def sync(self, file):
+        if self.fsync:
+            file.flush()
+            os.fsync(file.fileno())
+            self.fsync_count += 1
+
+    def read_json(self, path):
+        with tracing.span("read", "io", path=path):
+            with open(path, 'rb') as file:
+                data = file.read()
+        record_io(read=len(data))
+        with tracing.span("json.loads", "json", bytes=len(data)):
+            return json.loads(data)
+
+    def replace_file(self, path, data):
+        with tracing.span("json.dumps", "json"):
+            encoded = json.dumps(data).encode()
+        self.replace_bytes(path, encoded)
+
+    def temp_path(self, path):
+        # Unique per thread: snapshots and compaction write outside the lock.
+        return f"{path}.{os.getpid()}.{threading.get_native_id()}.tmp"
+
+    def replace_bytes(self, path, encoded):
+        # Write-then-rename so readers that don't take the lock never see a
+        # half-written file.
+        temp_path = self.temp_path(path)
+        with tracing.span("write", "io", path=path, bytes=len(encoded)):
+            with open(temp_path, 'wb') as file:
+                file.write(encoded)
+                self.sync(file)
+            os.replace(temp_path, path)
+        record_io(written=len(encoded))
+
+    @timed()
+    def set_budget(self, amount):
+        self.refresh_date()
         budget_data = {"budget": amount, "remaining": amount}
-        with open(self.budget_file, 'w') as file:
-            json.dump(budget_data, file)
+        with self.month_lock():
+            # Keep whatever a rollover carried into this month.
+            carried_over = (self.load_budget() or {}).get("carried_over")
+            if carried_over:
+                budget_data = {"budget": amount + carried_over, "remaining": amount + carried_over,
+                               "carried_over": carried_over}
+            self.write_budget(budget_data)
         return f"Budget of ${amount:.2f} set for {self.current_month_name} {self.current_year}."
 
+    @timed()
     def load_budget(self):
-        if os.path.exists(self.budget_file):
-            with open(self.budget_file, 'r') as file:
-                return json.load(file)
+        budget_data = self.cache.get(self.budget_file, self.read_json)
+        # A copy, since callers update it in place before writing it back.
+        return dict(budget_data) if budget_data is not None else None
+
+    def write_budget(self, budget_data):
+        self.replace_file(self.budget_file, budget_data)
+        self.cache.put(self.budget_file, dict(budget_data))
+
+    def load_columns(self):
+        # transactions.json holds the compacted part of the month and
+        # transactions.jsonl the entries appended since.
+        if not (self.cache.contains(self.transactions_file) or self.cache.contains(self.log_file)):
+            self.recover()
+        columns = [self.cache.get(self.transactions_file, self.read_columns),
+                   self.cache.get(self.log_file, self.read_log_columns)]
+        return [part for part in columns if part is not None]
+
+    @timed()
+    def load_transactions(self):
+        return merged_rows(self.load_columns())
+
+    def category_totals(self):
+        return merged_totals(self.load_columns())
+
+    def transactions_page(self, after_id=None, limit=100, since=None):
+        # Keyset pagination in id order, which is the order expenses were
+        # added: up to `limit` rows after after_id, or from `since` (a date or
+        # datetime) on. Returns (rows, next_after_id); next_after_id is None
+        # on the last page.
+        bound, inclusive = after_id, False
+        if since is not None:
+            floor = floor_id(since)
+            if after_id is None or floor > after_id:
+                bound, inclusive = floor, True
+        columns = self.load_columns()
+        if any(part.missing_ids for part in columns):
+            # A page can only end on a row with an id.
+            self.assign_missing_ids()
+            columns = self.load_columns()
+        rows = merged_page(columns, bound, inclusive, limit + 1)
+        if len(rows) > limit:
+            return rows[:limit], rows[limit - 1]["id"]
+        return rows, None
+
+    def assign_missing_ids(self):
+        # Rewrites the month with an id on every row from before ids existed
+        # (folding in the log), as compaction and sealing would.
+        with self.month_lock():
+            columns = self.load_columns()
+            if any(part.missing_ids for part in columns):
+                self.write_transactions(sorted(self.assign_ids(merged_rows(columns)), key=lambda row: row["id"]))
+
+    def find_transaction(self, transaction_id):
+        # The transaction as it stands after any edits, or None if the month
+        # has no such id or it was deleted.
+        for columns in reversed(self.load_columns()):
+            row = columns.find(transaction_id)
+            if row is not MISSING:
+                return row
         return None
 
-    def save_transaction(self, category, amount):
-        if os.path.exists(self.transactions_file):
-            with open(self.transactions_file, 'r') as file:
-                transactions = json.load(file)
-        else:
-            transactions = []
-
-        transaction = {
-            "date": str(self.current_date),
+    def read_columns(self, path):
+        return TransactionColumns(self.read_json(path))
+
+    def read_log_columns(self, path):
+        return TransactionColumns(self.read_log(path))
+
+    def read_log(self, path=None, offset=0, end=None):
+        path = path or self.log_file
+        if not os.path.exists(path):
+            return []
+        with tracing.span("read", "io", path=path):
+            with open(path, 'rb') as file:
+                file.seek(offset)
+                data = file.read() if end is None else file.read(end - offset)
+        record_io(read=len(data))
+        # Anything after the last newline is an append still in progress.
+        with tracing.span("json.loads", "json", bytes=len(data)):
+            return [json.loads(line) for line in data[:data.rfind(b"\n") + 1].splitlines()]
+
+    def append_transactions(self, transactions):
+        with tracing.span("json.dumps", "json"):
+            data = "".join(json.dumps(transaction) + "\n" for transaction in transactions).encode()
+        # Taken under the month lock, so a match afterwards means the cached
+        # log is exactly what was on disk before this append.
+        before = file_signature(self.log_file)
+        with tracing.span("append", "io", path=self.log_file, bytes=len(data)):
+            with open(self.log_file, 'ab') as file:
+                file.write(data)
+                self.sync(file)
+                log_size = file.tell()
+        record_io(written=len(data))
+        self.cache.extend(self.log_file, before, transactions)
+        self.maybe_checkpoint(log_size)
+
+    def record_category_use(self, transactions):
+        # Completion ranks count every stored expense, whichever process or
+        # path (GUI, daemon, HTTP, write-behind, import) stored it. Called
+        # after the month lock is released; the expenses are stored already,
+        # so a failure here is reported and otherwise ignored.
+        uses = Counter(transaction["category"] for transaction in transactions if "op" not in transaction)
+        if not uses:
+            return
+        try:
+            stats_for(self.base_folder).record(uses)
+        except OSError as e:
+            print(f"Couldn't record category usage in {self.base_folder}: {e!r}", file=sys.stderr)
+
+    def recover(self):
+        # Fills the cache from snapshot.bin plus the log entries appended
+        # after it, so a cold start parses only the log tail. Returns False,
+        # leaving the files to be parsed in full, when there is no snapshot
+        # or the files have been rewritten or edited since it was taken.
+        if not os.path.exists(self.snapshot_file):
+            return False
+        try:
+            with tracing.span("read", "io", path=self.snapshot_file):
+                with open(self.snapshot_file, 'rb') as file:
+                    data = file.read()
+            record_io(read=len(data))
+            with tracing.span("snapshot.decode", "snapshot", bytes=len(data)):
+                state = snapshot.decode(data)
+        except (OSError, snapshot.SnapshotError):
+            return False
+        except Exception as e:
+            # A snapshot that decodes but can't be rebuilt is as good as
+            # missing; the files themselves are still there to parse.
+            print(f"Ignoring unreadable snapshot {self.snapshot_file}: {e!r}", file=sys.stderr)
+            return False
+        base_signature = file_signature(self.transactions_file)
+        log_signature = file_signature(self.log_file)
+        if (base_signature[2:] if base_signature else None) != state.base_signature:
+            return False
+        if state.log_offset and (log_signature is None or log_signature[:2] != state.log_identity
+                                 or log_signature[3] < state.log_offset
+                                 or snapshot.tail_crc(self.log_file, state.log_offset) != state.tail_crc):
+            return False
+        log = state.log
+        if log_signature is not None:
+            log.extend(self.read_log(self.log_file, state.log_offset))
+            self.cache.store(self.log_file, log_signature, log, trusted=False)
+        if base_signature is not None:
+            self.cache.store(self.transactions_file, base_signature, state.base, trusted=False)
+        self.checkpointed_offset = state.log_offset
+        return True
+
+    @timed()
+    def checkpoint(self):
+        with self.month_lock():
+            return self.write_snapshot()
+
+    def write_snapshot(self):
+        # Callers must hold month_lock(), so the files can't move between
+        # reading them and recording their signatures.
+        base = self.cache.get(self.transactions_file, self.read_columns)
+        log = self.cache.get(self.log_file, self.read_log_columns) or TransactionColumns()
+        base_signature = file_signature(self.transactions_file)
+        log_signature = file_signature(self.log_file)
+        offset = log_signature[3] if log_signature else 0
+        state = snapshot.Snapshot(base_signature[2:] if base_signature else None,
+                                  log_signature[:2] if log_signature else None,
+                                  offset, snapshot.tail_crc(self.log_file, offset), base, log)
+        with tracing.span("snapshot.encode", "snapshot", rows=len(log) + len(base or ())):
+            data = snapshot.encode(state)
+        self.replace_bytes(self.snapshot_file, data)
+        self.checkpointed_offset = offset
+        return len(data)
+
+    def maybe_checkpoint(self, log_size):
+        if self.checkpoint_bytes is None:
+            return
+        if self.checkpointed_offset is None or self.checkpointed_offset > log_size:
+            self.checkpointed_offset = snapshot.read_log_offset(self.snapshot_file)
+            if self.checkpointed_offset > log_size:
+                self.checkpointed_offset = 0
+        if log_size - self.checkpointed_offset < self.checkpoint_bytes:
+            return
+        if self.checkpoint_thread is not None and self.checkpoint_thread.is_alive():
+            return
+        self.checkpoint_thread = threading.Thread(target=self.checkpoint, name="checkpoint", daemon=True)
+        self.checkpoint_thread.start()
+
+    @timed()
+    def write_transactions(self, transactions):
+        # Rewrites the whole month as a single compacted file. Callers must
+        # hold month_lock().
+        self.create_month_folder()
+        self.replace_file(self.transactions_file, transactions)
+        self.cache.put(self.transactions_file, TransactionColumns(transactions))
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+        self.cache.invalidate(self.log_file)
+
+    @timed()
+    def compact(self):
+        # Folds the log into transactions.json without holding the month lock
+        # while the new file is built and written, so add_expense only ever
+        # waits for the final rename. Returns False if there was nothing to
+        # fold or the files were rewritten by someone else meanwhile.
+        with self.month_lock():
+            base_signature = file_signature(self.transactions_file)
+            log_signature = file_signature(self.log_file)
+        if log_signature is None:
+            return False
+        # The log is append-only, so its first log_signature[3] bytes can be
+        # read without the lock; if either file is replaced meanwhile the
+        # signature check below gives up.
+        base = self.cache.get(self.transactions_file, self.read_columns)
+        log = TransactionColumns(self.read_log(self.log_file, 0, log_signature[3]))
+        merged = self.merge_segments(base, log)
+        with tracing.span("json.dumps", "json"):
+            encoded = json.dumps(merged.rows()).encode()
+        temp_path = self.temp_path(self.transactions_file)
+        with open(temp_path, 'wb') as file:
+            file.write(encoded)
+            self.sync(file)
+        record_io(written=len(encoded))
+        with self.month_lock():
+            current_log = file_signature(self.log_file)
+            if (file_signature(self.transactions_file) != base_signature or current_log is None
+                    or current_log[:2] != log_signature[:2] or current_log[3] < log_signature[3]):
+                os.remove(temp_path)
+                return False
+            with open(self.log_file, 'rb') as file:
+                file.seek(log_signature[3])
+                tail = file.read()
+            # Whatever was appended after the merge started becomes the new log.
+            if tail:
+                log_temp_path = self.temp_path(self.log_file)
+                with open(log_temp_path, 'wb') as file:
+                    file.write(tail)
+                    self.sync(file)
+            os.replace(temp_path, self.transactions_file)
+            if tail:
+                os.replace(log_temp_path, self.log_file)
+            else:
+                os.remove(self.log_file)
+            self.cache.put(self.transactions_file, merged)
+            self.cache.invalidate(self.log_file)
+            base_signature = file_signature(self.transactions_file)
+        state = snapshot.Snapshot(base_signature[2:], None, 0, 0, merged, TransactionColumns())
+        self.replace_bytes(self.snapshot_file, snapshot.encode(state))
+        self.checkpointed_offset = 0
+        return True
+
+    def merge_segments(self, base, log):
+        # Edits and deletes are applied and dropped, rows written before
+        # transactions had ids are given one, and the result is in id order.
+        segments = [log] if base is None else [base, log]
+        if (all(part.ordered and not part.overrides and not part.deleted for part in segments)
+                and (base is None or not base.ids or not log.ids or base.ids[-1] < log.ids[0])):
+            if base is None:
+                return log
+            return TransactionColumns.from_columns(
+                base.ids + log.ids, base.dates + log.dates, base.categories + log.categories,
+                base.amounts + log.amounts)
+        return TransactionColumns(sorted(self.assign_ids(merged_rows(segments)), key=lambda row: row["id"]))
+
+    def assign_ids(self, transactions):
+        # Stamped with the row's date, so they sort among that day's ids.
+        for transaction in transactions:
+            if "id" not in transaction:
+                date = datetime.date.fromisoformat(transaction["date"])
+                transaction["id"] = new_id(timestamp_ms(date))
+        return transactions
+
+    @timed()
+    def seal(self):
+        # Compacts a finished month into a date-ordered transactions.json and
+        # writes summary.json next to it: per-category totals and a per-day
+        # index of the first row, row count and total for each date.
+        with self.month_lock():
+            # Date, then id: the same as id order unless rows were dated
+            # by a clock other than the system's.
+            transactions = sorted(self.assign_ids(self.load_transactions()),
+                                  key=lambda transaction: (transaction["date"], transaction["id"]))
+            self.write_transactions(transactions)
+            summary = self.build_summary(transactions)
+            summary["signature"] = list(file_signature(self.transactions_file)[2:])
+            self.replace_file(self.summary_file, summary)
+            self.write_snapshot()
+        return summary
+
+    def build_summary(self, transactions):
+        categories = {}
+        days = {}
+        for row, transaction in enumerate(transactions):
+            amount = transaction["amount"]
+            category = categories.setdefault(transaction["category"], {"count": 0, "total": 0})
+            category["count"] += 1
+            category["total"] += amount
+            day = days.setdefault(transaction["date"], {"first": row, "count": 0, "total": 0})
+            day["count"] += 1
+            day["total"] += amount
+        return {
+            "transactions": len(transactions),
+            "total": sum(category["total"] for category in categories.values()),
+            "categories": categories,
+            "days": days,
+        }
+
+    def load_summary(self):
+        # The summary written by seal(), or None if the month was never sealed
+        # or has been written to since.
+        if not os.path.exists(self.summary_file) or os.path.exists(self.log_file):
+            return None
+        summary = self.read_json(self.summary_file)
+        signature = file_signature(self.transactions_file)
+        if signature is None or list(signature[2:]) != summary["signature"]:
+            return None
+        return summary
+
+    def carry_forward_to(self, following):
+        # Moves this month's unspent budget onto `following`. The amount is
+        # recorded here first, so a second rollover doesn't carry it twice.
+        with self.month_lock():
+            budget_data = self.load_budget()
+            if not budget_data or "carried_forward" in budget_data:
+                return 0
+            leftover = max(budget_data["remaining"], 0)
+            budget_data["carried_forward"] = leftover
+            self.write_budget(budget_data)
+        if leftover:
+            with following.month_lock():
+                # Expenses already added to a month with no budget were never
+                # charged, so a budget created here starts net of them.
+                budget_data = following.load_budget() or {
+                    "budget": 0, "remaining": -sum(following.category_totals().values())}
+                budget_data["budget"] += leftover
+                budget_data["remaining"] += leftover
+                budget_data["carried_over"] = budget_data.get("carried_over", 0) + leftover
+                following.write_budget(budget_data)
+        return leftover
+
+    def canonical_category(self, category):
+        if not self.canonicalize:
+            return category
+        return store_for(self.base_folder).canonical(category, self.fuzzy_categories)
+
+    def make_transaction(self, category, amount, date=None):
+        category = self.canonical_category(category)
+        return {
+            "id": new_id(),
+            "date": str(date or self.current_date),
             "category": category,
             "amount": amount
         }
-        transactions.append(transaction)
 
-        with open(self.transactions_file, 'w') as file:
-            json.dump(transactions, file)
+    @timed()
+    def save_transaction(self, category, amount):
+        self.save_transactions([(category, amount)])
+
+    @timed()
+    def save_transactions(self, expenses):
+        self.refresh_date()
+        transactions = [self.make_transaction(category, amount) for category, amount in expenses]
+        with self.month_lock():
+            self.append_transactions(transactions)
+        self.record_category_use(transactions)
 
+    @timed()
     def update_budget(self, amount):
+        with self.month_lock():
+            self.charge_budget(amount)
+
+    def charge_budget(self, amount):
+        # Callers must hold month_lock().
         budget_data = self.load_budget()
         if budget_data:
             budget_data["remaining"] -= amount
-            with open(self.budget_file, 'w') as file:
-                json.dump(budget_data, file)
+            self.write_budget(budget_data)
+        return budget_data
 
-    def add_expense(self, category, amount):
-        self.save_transaction(category, amount)
-        self.update_budget(amount)
-        budget_data = self.load_budget()
+    @timed()
+    def add_expense(self, category, amount, key=None):
+        return self.add_expenses([(category, amount)], key)
+
+    @timed()
+    def add_expenses(self, expenses, key=None):
+        # One append and one budget write for the whole batch of (category, amount) pairs.
+        if key is not None:
+            return self.idempotent(key, self.add_expenses, expenses)
+        expenses = list(expenses)
+        self.refresh_date()
+        transactions = [self.make_transaction(category, amount) for category, amount in expenses]
+        with self.month_lock():
+            self.append_transactions(transactions)
+            budget_data = self.charge_budget(sum(amount for _, amount in expenses))
+        self.record_category_use(transactions)
+        return self.expense_added_message(budget_data, len(expenses))
+
+    def idempotent(self, key, add, *args):
+        # Runs add(*args) unless a call with the same key already completed
+        # (see idempotency.py), in which case its message is returned again.
+        index = index_for(self.base_folder)
+        with index.locked():
+            message = index.lookup(key)
+            if message is None:
+                message = add(*args)
+                index.record(key, message, self.sync)
+        return message
+
+    @timed()
+    def edit_expense(self, transaction_id, category=None, amount=None):
+        # The log gets a replacement record carrying both the old and new
+        # values, so totals and the budget move by the difference instead of
+        # being recomputed. The date and id stay as they were.
+        self.refresh_date()
+        with self.month_lock():
+            old = self.existing_transaction(transaction_id)
+            new = dict(old)
+            if category is not None:
+                new["category"] = self.canonical_category(category)
+            if amount is not None:
+                new["amount"] = amount
+            self.append_transactions([{"op": "edit", "id": transaction_id,
+                                       "old": self.row_values(old), "new": self.row_values(new)}])
+            budget_data = self.charge_budget(new["amount"] - old["amount"])
+        return self.expense_changed_message(budget_data, "updated")
+
+    @timed()
+    def delete_expense(self, transaction_id):
+        # A tombstone in the log; compaction drops the row for good.
+        self.refresh_date()
+        with self.month_lock():
+            old = self.existing_transaction(transaction_id)
+            self.append_transactions([{"op": "delete", "id": transaction_id, "old": self.row_values(old)}])
+            budget_data = self.charge_budget(-old["amount"])
+        return self.expense_changed_message(budget_data, "deleted")
+
+    def existing_transaction(self, transaction_id):
+        transaction = self.find_transaction(transaction_id)
+        if transaction is None:
+            raise KeyError(f"No expense with id {transaction_id} in {self.current_month_name} {self.current_year}")
+        return transaction
+
+    def row_values(self, transaction):
+        return {"date": transaction["date"], "category": transaction["category"], "amount": transaction["amount"]}
+
+    def expense_changed_message(self, budget_data, change):
         if budget_data:
             remaining = budget_data["remaining"]
-            return f"Expense added. Remaining budget: ${remaining:.2f}"
-        return "Expense added, but couldn't update budget."
+            return f"Expense {change}. Remaining budget: ${remaining:.2f}"
+        return f"Expense {change}, but couldn't update budget."
 
+    def expense_added_message(self, budget_data, count=1):
+        added = "Expense added" if count == 1 else f"{count} expenses added"
+        if budget_data:
+            remaining = budget_data["remaining"]
+            return f"{added}. Remaining budget: ${remaining:.2f}"
+        return f"{added}, but couldn't update budget."
+
+    @timed()
     def check_budget(self):
-        budget_data = self.load_budget()
+        self.refresh_date()
+        return self.budget_warning(self.load_budget())
+
+    def budget_warning(self, budget_data):
         if budget_data:
             remaining = budget_data["remaining"]
             budget = budget_data["budget"]
@@ -82,32 +645,33 @@ class DailyBudgetTracker:
                 return f"WARNING: You are within 10% of your budget limit for this month! Remaining: ${remaining:.2f}"
         return ""
 
+    @timed()
     def get_expense_summary(self):
+        self.refresh_date()
         budget_data = self.load_budget()
         if not budget_data:
             return "No budget data available for this month."
+        return self.format_totals(budget_data, self.category_totals())
 
-        if os.path.exists(self.transactions_file):
-            with open(self.transactions_file, 'r') as file:
-                transactions = json.load(file)
-        else:
-            transactions = []
-
-        summary = f"Expense Summary for {self.current_month_name} {self.current_year}\n\n"
-        total_expenses = 0
+    @timed()
+    def format_summary(self, budget_data, transactions):
         category_expenses = {}
 
         for transaction in transactions:
             category = transaction["category"]
             amount = transaction["amount"]
-            total_expenses += amount
             if category not in category_expenses:
                 category_expenses[category] = 0
             category_expenses[category] += amount
 
+        return self.format_totals(budget_data, category_expenses)
+
+    def format_totals(self, budget_data, category_expenses):
+        summary = f"Expense Summary for {self.current_month_name} {self.current_year}\n\n"
         for category, amount in category_expenses.items():
             summary += f"{category}: ${amount:.2f}\n"
 
+        total_expenses = sum(category_expenses.values())
         summary += f"\nTotal Expenses: ${total_expenses:.2f}\n"
         remaining = budget_data['remaining']
         summary += f"Remaining Budget: ${remaining:.2f}\n"
@@ -117,10 +681,98 @@ class DailyBudgetTracker:
 
         return summary
 
-class BudgetTrackerGUI(QMainWindow):
+class TracedApplication(QApplication):
+    # Used instead of QApplication when tracing, so every event dispatch (and
+    # the handlers it runs) shows up as a span on the GUI thread.
+    def notify(self, receiver, event):
+        with tracing.span(event.type().name, "qt", receiver=type(receiver).__name__):
+            return super().notify(receiver, event)
+
+class CategoryDelegate(QStyledItemDelegate):
+    # Category cells in the entry grid complete like the expense page.
+    def __init__(self, gui):
+        super().__init__(gui)
+        self.gui = gui
+
+    def createEditor(self, parent, option, index):
+        editor = super().createEditor(parent, option, index)
+        if isinstance(editor, QLineEdit):
+            self.gui.attach_completer(editor)
+        return editor
+
+class PastedRowsModel(QAbstractTableModel):
+    # Read-only view of parse_pasted's rows for the paste preview, so a
+    # paste of any size is one model reset rather than a widget per cell.
+    HEADERS = ("Line", "Category", "Amount", "Problem")
+    ERROR = QColor("#f8d7da")
+
     def __init__(self):
         super().__init__()
-        self.tracker = DailyBudgetTracker()
+        self.pasted = []
+
+    def set_rows(self, pasted):
+        self.beginResetModel()
+        self.pasted = pasted
+        self.endResetModel()
+
+    def expenses(self):
+        return [(row.category, row.amount) for row in self.pasted if row.error is None]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.pasted)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        row = self.pasted[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return row.line
+            if column == 1:
+                return row.category
+            if column == 2:
+                return "" if row.amount is None else f"{row.amount:.2f}"
+            return row.error or ""
+        if role == Qt.ItemDataRole.BackgroundRole and row.error is not None:
+            return self.ERROR
+        return None
+
+class BackgroundCall(QObject):
+    # Runs function(*args) on a worker thread and emits (result, error) back
+    # on the GUI thread, so slow work doesn't stall the event loop.
+    done = pyqtSignal(object, object)
+
+    def __init__(self, function, *args):
+        super().__init__()
+        self.thread = threading.Thread(target=self.run, args=(function, args), daemon=True)
+
+    def run(self, function, args):
+        try:
+            result, error = function(*args), None
+        except Exception as e:
+            result, error = None, e
+        self.done.emit(result, error)
+
+class BudgetTrackerGUI(QMainWindow):
+    def __init__(self, tracker=None, pool=None):
+        super().__init__()
+        # self.tracker is always the current month, which expenses go to; it
+        # follows the clock, so it is kept out of the pool, which holds the
+        # handles for every other month.
+        self.tracker = tracker or DailyBudgetTracker()
+        base_folder = getattr(self.tracker, "base_folder", "budget_data")
+        self.pool = pool or TrackerPool(lambda year, month: DailyBudgetTracker(base_folder, year, month))
+        categories = store_for(base_folder)
+        categories.refresh()
+        self.category_stats = stats_for(base_folder).load(categories.index.names.values())
+        self.background = None
         self.init_ui()
 
     def init_ui(self):
@@ -138,6 +790,8 @@ class BudgetTrackerGUI(QMainWindow):
         self.create_budget_page()
         self.create_expense_page()
         self.create_summary_page()
+        self.create_entry_page()
+        self.create_paste_page()
 
         # Apply custom styling
         self.apply_styles()
@@ -190,6 +844,11 @@ class BudgetTrackerGUI(QMainWindow):
         btn_add_expense.clicked.connect(self.show_expense_page)
         menu_layout.addWidget(btn_add_expense)
 
+        btn_quick_entry = QPushButton('Quick Entry')
+        btn_quick_entry.setIcon(QIcon("icons/expense.png"))
+        btn_quick_entry.clicked.connect(self.show_entry_page)
+        menu_layout.addWidget(btn_quick_entry)
+
         btn_view_summary = QPushButton('View Summary')
         btn_view_summary.setIcon(QIcon("icons/summary.png"))
         btn_view_summary.clicked.connect(self.show_summary_page)
@@ -235,6 +894,8 @@ class BudgetTrackerGUI(QMainWindow):
 
         self.category_input = QLineEdit()
         self.category_input.setPlaceholderText('Enter expense category')
+        self.category_model = QStringListModel()
+        self.attach_completer(self.category_input)
         layout.addWidget(self.category_input)
 
         self.amount_input = QLineEdit()
@@ -245,12 +906,25 @@ class BudgetTrackerGUI(QMainWindow):
         btn_add.clicked.connect(self.add_expense)
         layout.addWidget(btn_add)
 
+        btn_paste = QPushButton('Paste Rows from Spreadsheet')
+        btn_paste.clicked.connect(self.paste_rows)
+        layout.addWidget(btn_paste)
+
         btn_back = QPushButton('Back to Main Menu')
         btn_back.clicked.connect(self.show_main_menu)
         layout.addWidget(btn_back)
 
         self.stacked_widget.addWidget(expense_page)
 
+    def attach_completer(self, line_edit):
+        # The completer shows whatever complete_category puts in the model,
+        # already ranked, instead of filtering a full list itself.
+        completer = QCompleter(self.category_model, line_edit)
+        completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        line_edit.setCompleter(completer)
+        line_edit.textEdited.connect(self.complete_category)
+
     def create_summary_page(self):
         summary_page = QWidget()
         layout = QVBoxLayout(summary_page)
@@ -273,15 +947,106 @@ class BudgetTrackerGUI(QMainWindow):
 
         self.stacked_widget.addWidget(summary_page)
 
+    def create_entry_page(self):
+        # Rows are staged in the grid and added in one batch, so a stack of
+        # receipts costs one write and one budget check instead of one each.
+        entry_page = QWidget()
+        layout = QVBoxLayout(entry_page)
+
+        title = QLabel('Quick Entry')
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        title.setFont(QFont('Arial', 14))
+        layout.addWidget(title)
+
+        self.entry_table = QTableWidget(1, 2)
+        self.entry_table.setHorizontalHeaderLabels(['Category', 'Amount'])
+        self.entry_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        # Typing or tabbing into a cell starts editing it.
+        self.entry_table.setEditTriggers(QAbstractItemView.EditTrigger.CurrentChanged
+                                         | QAbstractItemView.EditTrigger.AnyKeyPressed
+                                         | QAbstractItemView.EditTrigger.DoubleClicked)
+        self.entry_table.setItemDelegateForColumn(0, CategoryDelegate(self))
+        self.entry_table.cellChanged.connect(self.entry_changed)
+        layout.addWidget(self.entry_table)
+
+        self.entry_status = QLabel('Tab between cells; Ctrl+Enter adds every row.')
+        self.entry_status.setWordWrap(True)
+        layout.addWidget(self.entry_status)
+
+        btn_commit = QPushButton('Add All')
+        btn_commit.clicked.connect(self.commit_entries)
+        layout.addWidget(btn_commit)
+        QShortcut(QKeySequence("Ctrl+Return"), entry_page, self.commit_entries)
+        QShortcut(QKeySequence("Ctrl+Enter"), entry_page, self.commit_entries)
+        # A cell being edited handles its own paste.
+        paste = QShortcut(QKeySequence.StandardKey.Paste, self.entry_table, self.paste_rows)
+        paste.setContext(Qt.ShortcutContext.WidgetShortcut)
+
+        btn_back = QPushButton('Back to Main Menu')
+        btn_back.clicked.connect(self.show_main_menu)
+        layout.addWidget(btn_back)
+
+        self.stacked_widget.addWidget(entry_page)
+
+    def create_paste_page(self):
+        # Pasted rows are parsed off the GUI thread into a preview, and the
+        # rows that can be added go in with one add_expenses call.
+        paste_page = QWidget()
+        layout = QVBoxLayout(paste_page)
+
+        title = QLabel('Paste Preview')
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        title.setFont(QFont('Arial', 14))
+        layout.addWidget(title)
+
+        self.pasted_model = PastedRowsModel()
+        preview = QTableView()
+        preview.setModel(self.pasted_model)
+        preview.verticalHeader().hide()
+        preview.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(preview)
+
+        self.paste_status = QLabel()
+        self.paste_status.setWordWrap(True)
+        layout.addWidget(self.paste_status)
+
+        self.btn_add_pasted = QPushButton('Add Expenses')
+        self.btn_add_pasted.clicked.connect(self.commit_pasted)
+        layout.addWidget(self.btn_add_pasted)
+
+        self.btn_paste_back = QPushButton('Back to Main Menu')
+        self.btn_paste_back.clicked.connect(self.show_main_menu)
+        layout.addWidget(self.btn_paste_back)
+
+        self.stacked_widget.addWidget(paste_page)
+
+    def closeEvent(self, event):
+        if self.background is not None:
+            # Let a commit in progress finish writing.
+            self.background.thread.join()
+        close = getattr(self.tracker, "close", None)
+        if close:
+            close()
+        self.pool.close_all()
+        super().closeEvent(event)
+
+    @pyqtSlot()
+    @timed(category="gui")
     def show_main_menu(self):
         self.stacked_widget.setCurrentIndex(0)
 
+    @pyqtSlot()
+    @timed(category="gui")
     def show_budget_page(self):
         self.stacked_widget.setCurrentIndex(1)
 
+    @pyqtSlot()
+    @timed(category="gui")
     def show_expense_page(self):
         self.stacked_widget.setCurrentIndex(2)
 
+    @pyqtSlot()
+    @timed(category="gui")
     def show_summary_page(self):
         self.summary_text.setText(self.tracker.get_expense_summary())
         budget_data = self.tracker.load_budget()
@@ -292,19 +1057,38 @@ class BudgetTrackerGUI(QMainWindow):
             self.progress_bar.setValue(percentage_used)
         self.stacked_widget.setCurrentIndex(3)
 
+    @pyqtSlot()
+    @timed(category="gui")
+    def show_entry_page(self):
+        self.stacked_widget.setCurrentIndex(4)
+        self.edit_entry(self.entry_table.rowCount() - 1)
 
+    def edit_entry(self, row):
+        table = self.entry_table
+        table.setFocus()
+        table.setCurrentCell(row, 0)
+        if table.state() != QAbstractItemView.State.EditingState:
+            # Already the current cell, so moving there opened no editor.
+            table.edit(table.model().index(row, 0))
+
+    @pyqtSlot()
+    @timed(category="gui")
     def set_budget(self):
         month = self.month_combo.currentIndex() + 1
         amount = float(self.budget_input.text())
-        self.tracker.current_month = month
-        self.tracker.current_month_name = calendar.month_name[month]
-        self.tracker.current_folder = os.path.join(self.tracker.base_folder, f"{self.tracker.current_year}_{self.tracker.current_month_name}")
-        self.tracker.transactions_file = os.path.join(self.tracker.current_folder, "transactions.json")
-        self.tracker.budget_file = os.path.join(self.tracker.current_folder, "budget.json")
-        result = self.tracker.set_budget(amount)
+        tracker = self.tracker
+        if month != tracker.current_month:
+            tracker = self.pool.get(tracker.current_year, month)
+        result = tracker.set_budget(amount)
         QMessageBox.information(self, "Budget Set", result)
         self.show_main_menu()
 
+    @pyqtSlot(str)
+    def complete_category(self, text):
+        self.category_model.setStringList(self.category_stats.complete(text.strip()) if text.strip() else [])
+
+    @pyqtSlot()
+    @timed(category="gui")
     def add_expense(self):
         category = self.category_input.text()
         amount = float(self.amount_input.text())
@@ -317,9 +1101,163 @@ class BudgetTrackerGUI(QMainWindow):
         self.amount_input.clear()
         self.show_main_menu()
 
+    @pyqtSlot(int, int)
+    def entry_changed(self, row, column):
+        # Keeps an empty row at the bottom to type into, and clears the
+        # error mark of a cell once it is edited.
+        table = self.entry_table
+        table.blockSignals(True)
+        table.item(row, column).setBackground(QBrush())
+        table.blockSignals(False)
+        if row == table.rowCount() - 1 and table.item(row, column).text().strip():
+            table.insertRow(table.rowCount())
+
+    def staged_entries(self):
+        # ([(category, amount)], [error]) from the grid; blank rows are
+        # skipped and cells that can't be added are marked.
+        table = self.entry_table
+        expenses, errors = [], []
+        table.blockSignals(True)
+        for row in range(table.rowCount()):
+            cells = [table.item(row, column) for column in range(2)]
+            category, amount = [cell.text().strip() if cell else "" for cell in cells]
+            if not category and not amount:
+                continue
+            if not category:
+                errors.append(f"Row {row + 1}: no category")
+                self.mark_entry(row, 0)
+                continue
+            try:
+                expenses.append((category, float(amount)))
+            except ValueError:
+                errors.append(f"Row {row + 1}: {amount!r} is not an amount")
+                self.mark_entry(row, 1)
+        table.blockSignals(False)
+        return expenses, errors
+
+    def mark_entry(self, row, column):
+        item = self.entry_table.item(row, column)
+        if item is None:
+            item = QTableWidgetItem()
+            self.entry_table.setItem(row, column, item)
+        item.setBackground(QColor("#f8d7da"))
+
+    @pyqtSlot()
+    @timed(category="gui")
+    def commit_entries(self):
+        # Nothing is added while any row has an error, so fixing it and
+        # committing again can't add the good rows twice.
+        table = self.entry_table
+        current = table.currentIndex()
+        if table.state() == QAbstractItemView.State.EditingState:
+            # Ctrl+Enter doesn't close the cell being typed in; moving off it
+            # commits and closes the view's own editor, whatever has focus.
+            table.setCurrentIndex(QModelIndex())
+        expenses, errors = self.staged_entries()
+        if errors:
+            more = f" and {len(errors) - 3} more" if len(errors) > 3 else ""
+            self.entry_status.setText(f"Nothing added. {'; '.join(errors[:3])}{more}.")
+            table.setCurrentIndex(current)
+            return
+        if not expenses:
+            self.entry_status.setText("No expenses to add.")
+            table.setCurrentIndex(current)
+            return
+        self.entry_status.setText(self.add_batch(expenses))
+        table.setRowCount(0)
+        table.setRowCount(1)
+        self.edit_entry(0)
+
+    def add_batch(self, expenses):
+        # One write and one budget check for the lot; the status line text.
+        result = self.tracker.add_expenses(expenses)
+        warning = self.tracker.check_budget()
+        return f"{result}\n{warning}" if warning else result
+
+    def run_in_background(self, done, function, *args):
+        self.btn_add_pasted.setEnabled(False)
+        self.btn_paste_back.setEnabled(False)
+        self.background = BackgroundCall(function, *args)
+        self.background.done.connect(done)
+        self.background.thread.start()
+
+    def background_done(self):
+        self.background.thread.join()
+        self.background = None
+        self.btn_paste_back.setEnabled(True)
+
+    @pyqtSlot()
+    @timed(category="gui")
+    def paste_rows(self):
+        if self.background is not None:
+            return
+        text = QApplication.clipboard().text()
+        self.stacked_widget.setCurrentIndex(5)
+        self.pasted_model.set_rows([])
+        if not text.strip():
+            self.paste_status.setText("The clipboard has no rows to paste.")
+            self.btn_add_pasted.setEnabled(False)
+            return
+        self.paste_status.setText(f"Reading {text.count(chr(10)) + 1:,} lines...")
+        self.run_in_background(self.pasted, parse_pasted, text)
+
+    @pyqtSlot(object, object)
+    def pasted(self, pasted, error):
+        self.background_done()
+        if error is not None:
+            self.paste_status.setText(f"Couldn't read the pasted rows: {error}")
+            return
+        self.pasted_model.set_rows(pasted)
+        ready = len(self.pasted_model.expenses())
+        problems = len(pasted) - ready
+        status = f"Ready to add: {ready:,}."
+        if problems:
+            status += f" Marked as unreadable and skipped: {problems:,}."
+        self.paste_status.setText(status)
+        self.btn_add_pasted.setText(f"Add {ready:,} Expenses")
+        self.btn_add_pasted.setEnabled(ready > 0)
+
+    @pyqtSlot()
+    @timed(category="gui")
+    def commit_pasted(self):
+        expenses = self.pasted_model.expenses()
+        if self.background is not None or not expenses:
+            return
+        self.paste_status.setText(f"Adding {len(expenses):,} expenses...")
+        self.run_in_background(self.committed_pasted, self.add_batch, expenses)
+
+    @pyqtSlot(object, object)
+    def committed_pasted(self, result, error):
+        self.background_done()
+        if error is not None:
+            self.paste_status.setText(f"Adding the pasted rows failed: {error}")
+            self.btn_add_pasted.setEnabled(True)
+            return
+        self.pasted_model.set_rows([])
+        self.btn_add_pasted.setText('Add Expenses')
+        self.paste_status.setText(result)
+
 def main():
-    app = QApplication(sys.argv)
-    ex = BudgetTrackerGUI()
+    app = TracedApplication(sys.argv) if tracing.ENABLED else QApplication(sys.argv)
+    factory = lambda year, month: DailyBudgetTracker(year=year, month=month)
+    socket_path = os.environ.get("BUDGET_TRACKER_SOCKET")
+    if socket_path:
+        from tracker_daemon import TrackerClient
+        factory = lambda year, month: TrackerClient(socket_path, year, month)
+    elif os.environ.get("BUDGET_TRACKER_WRITE_BEHIND"):
+        from write_behind import WriteBehindTracker
+        factory = lambda year, month: WriteBehindTracker(year=year, month=month)
+    tracker = factory(None, None)
+    carry_forward = bool(os.environ.get("BUDGET_TRACKER_CARRY_FORWARD"))
+    if not socket_path:
+        # With a daemon, the daemon does this for the files it owns.
+        tracker.carry_forward = carry_forward
+        from compaction import Compactor
+        Compactor(tracker.base_folder, clock=tracker.clock, carry_forward=carry_forward).start()
+    elif carry_forward:
+        print("BUDGET_TRACKER_CARRY_FORWARD is ignored with a daemon; start the daemon with --carry-forward",
+              file=sys.stderr)
+    ex = BudgetTrackerGUI(tracker, TrackerPool(factory))
     ex.show()
     sys.exit(app.exec())
 
@@ -0,0 +1,93 @@
+import os
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class LockStats:
+    def __init__(self):
+        self.guard = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.hold_seconds = 0.0
+        self.max_hold_seconds = 0.0
+
+    def record_acquire(self, waited, contended):
+        with self.guard:
+            self.acquisitions += 1
+            self.contended += contended
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def record_release(self, held):
+        with self.guard:
+            self.hold_seconds += held
+            self.max_hold_seconds = max(self.max_hold_seconds, held)
+
+    def as_dict(self):
+        with self.guard:
+            return {
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "wait_seconds": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+                "hold_seconds": self.hold_seconds,
+                "max_hold_seconds": self.max_hold_seconds,
+            }
+
+
+class FileLock:
+    # Exclusive advisory lock shared by every process that opens the same
+    # path. Uses flock where available and falls back to an O_EXCL lock file
+    # elsewhere. Not reentrant: don't take the same lock twice in one thread.
+    def __init__(self, path, stats=None, poll_interval=0.001):
+        self.path = path
+        self.stats = stats
+        self.poll_interval = poll_interval
+        self.fd = None
+        self.acquired_at = None
+
+    def acquire(self):
+        started = time.perf_counter()
+        contended = False
+        if fcntl:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                contended = True
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+        else:
+            while self.fd is None:
+                try:
+                    self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+                except FileExistsError:
+                    contended = True
+                    time.sleep(self.poll_interval)
+        self.acquired_at = time.perf_counter()
+        if self.stats:
+            self.stats.record_acquire(self.acquired_at - started, contended)
+
+    def release(self):
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+        else:
+            os.close(self.fd)
+            os.unlink(self.path)
+        self.fd = None
+        if self.stats:
+            self.stats.record_release(time.perf_counter() - self.acquired_at)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
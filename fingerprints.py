@@ -0,0 +1,148 @@
+import os
+import re
+import math
+import struct
+import hashlib
+import threading
+
+# imports.bloom layout, little-endian: magic, hash count, capacity, items
+# added, bit count, then the bits. imports.fp holds every fingerprint as 16
+# raw bytes, appended in import order.
+MAGIC = b"BTBLOOM1"
+HEADER = struct.Struct("<8sIIQQ")
+FINGERPRINT_BYTES = 16
+DEFAULT_CAPACITY = 4096
+ERROR_RATE = 0.01
+
+NOT_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_description(description):
+    # Case, punctuation and spacing differ between exports of the same
+    # statement; the words don't.
+    return " ".join(NOT_WORD.sub(" ", description.casefold()).split())
+
+
+def fingerprint(date, amount, description, occurrence=0):
+    # occurrence tells apart identical rows within one statement (two
+    # coffees on the same day); the importer counts it per (date, amount,
+    # description), so a re-import produces the same sequence again.
+    key = f"{date}\x1f{amount:.2f}\x1f{normalize_description(description)}\x1f{occurrence}"
+    return hashlib.blake2b(key.encode(), digest_size=FINGERPRINT_BYTES).digest()
+
+
+class BloomFilter:
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item):
+        # item is already a uniform hash, so its two halves drive double
+        # hashing instead of hashing it again k times.
+        first = int.from_bytes(item[:8], "little")
+        second = int.from_bytes(item[8:16], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+    def to_bytes(self):
+        return HEADER.pack(MAGIC, self.hashes, self.capacity, self.count, self.size) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        # Raises ValueError if data isn't a filter.
+        try:
+            magic, hashes, capacity, count, size = HEADER.unpack_from(data)
+        except struct.error:
+            raise ValueError("Bloom filter is truncated")
+        bits = data[HEADER.size:]
+        if magic != MAGIC or len(bits) != (size + 7) // 8:
+            raise ValueError("Not a Bloom filter, or written by an incompatible version")
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.size = size
+        bloom.hashes = hashes
+        bloom.bits = bytearray(bits)
+        bloom.count = count
+        return bloom
+
+
+class FingerprintStore:
+    # Fingerprints of every statement row imported into one month. The Bloom
+    # filter answers most lookups, which for new rows are misses, from a few
+    # kilobytes; the exact list in imports.fp is only read to confirm a
+    # "maybe". The filter is rebuilt four times larger whenever it fills up.
+    # Callers must hold the month's lock.
+    def __init__(self, folder):
+        self.bloom_file = os.path.join(folder, "imports.bloom")
+        self.exact_file = os.path.join(folder, "imports.fp")
+        self.bloom = None
+        self.exact = None
+        self.confirmations = 0
+
+    def load_bloom(self):
+        if self.bloom is None:
+            try:
+                with open(self.bloom_file, 'rb') as file:
+                    self.bloom = BloomFilter.from_bytes(file.read())
+            except (OSError, ValueError):
+                # Missing or damaged: rebuilt from the exact list.
+                self.rebuild(DEFAULT_CAPACITY)
+        return self.bloom
+
+    def load_exact(self):
+        if self.exact is None:
+            data = b""
+            if os.path.exists(self.exact_file):
+                with open(self.exact_file, 'rb') as file:
+                    data = file.read()
+            usable = len(data) - len(data) % FINGERPRINT_BYTES
+            self.exact = {data[i:i + FINGERPRINT_BYTES] for i in range(0, usable, FINGERPRINT_BYTES)}
+        return self.exact
+
+    def rebuild(self, capacity):
+        exact = self.load_exact()
+        while capacity < len(exact):
+            capacity *= 4
+        self.bloom = BloomFilter(capacity)
+        for item in exact:
+            self.bloom.add(item)
+
+    def __contains__(self, item):
+        if item not in self.load_bloom():
+            return False
+        self.confirmations += 1
+        return item in self.load_exact()
+
+    def add_all(self, items, sync=None):
+        if not items:
+            return
+        with open(self.exact_file, 'ab') as file:
+            file.write(b"".join(items))
+            if sync:
+                sync(file)
+        if self.exact is not None:
+            self.exact.update(items)
+        bloom = self.load_bloom()
+        if bloom.count + len(items) > bloom.capacity:
+            self.exact = None
+            self.rebuild(bloom.capacity * 4)
+        else:
+            for item in items:
+                bloom.add(item)
+        temp_path = f"{self.bloom_file}.{os.getpid()}.{threading.get_native_id()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(self.bloom.to_bytes())
+            if sync:
+                sync(file)
+        os.replace(temp_path, self.bloom_file)
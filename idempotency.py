@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from file_lock import FileLock
+
+DEFAULT_TTL = float(os.environ.get("BUDGET_TRACKER_IDEMPOTENCY_DAYS", "7")) * 86400
+DEFAULT_MAX_ENTRIES = 100_000
+MAX_KEY_LENGTH = 200
+
+
+class IdempotencyIndex:
+    # Keys of recently completed add_expense calls and the message each one
+    # returned, so a retried call gets the same answer without writing again.
+    # Persisted as an append-only idempotency.jsonl shared by every process
+    # using the folder. Keys expire after ttl seconds and at most max_entries
+    # are kept, so memory and the file stay bounded however long it runs.
+    def __init__(self, base_folder, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, now=time.time):
+        self.base_folder = base_folder
+        self.path = os.path.join(base_folder, "idempotency.jsonl")
+        self.lock_path = os.path.join(base_folder, ".idempotency.lock")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.now = now
+        # key -> (recorded_at, message), oldest first.
+        self.entries = OrderedDict()
+        # Identity of the file and how far into it has been read, so each
+        # lookup only parses what other processes appended since.
+        self.identity = None
+        self.offset = 0
+        self.lines = 0
+        self.hits = 0
+        self.misses = 0
+
+    def locked(self):
+        # Held across the lookup, the write it guards and the record, by
+        # every thread and process. Taken before any month lock.
+        os.makedirs(self.base_folder, exist_ok=True)
+        return FileLock(self.lock_path)
+
+    def check_key(self, key):
+        if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f"Idempotency keys must be non-empty strings of at most {MAX_KEY_LENGTH} characters")
+
+    def refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self.entries.clear()
+            self.identity = None
+            self.offset = self.lines = 0
+            return
+        if (st.st_dev, st.st_ino) != self.identity or st.st_size < self.offset:
+            # Rewritten by another process: start over.
+            self.entries.clear()
+            self.identity = (st.st_dev, st.st_ino)
+            self.offset = self.lines = 0
+        if st.st_size == self.offset:
+            return
+        with open(self.path, 'rb') as file:
+            file.seek(self.offset)
+            data = file.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            entry = json.loads(line)
+            self.remember(entry["key"], entry["at"], entry["message"])
+            self.lines += 1
+        self.offset += end
+
+    def remember(self, key, recorded_at, message):
+        self.entries.pop(key, None)
+        self.entries[key] = (recorded_at, message)
+
+    def expire(self):
+        cutoff = self.now() - self.ttl
+        while self.entries:
+            recorded_at, _ = next(iter(self.entries.values()))
+            if recorded_at >= cutoff and len(self.entries) <= self.max_entries:
+                break
+            self.entries.popitem(last=False)
+
+    def lookup(self, key):
+        # The message recorded for key, or None. Callers must hold locked().
+        self.check_key(key)
+        self.refresh()
+        self.expire()
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def record(self, key, message, sync=None):
+        # Callers must hold locked() and have just called lookup(), so the
+        # file ends exactly where this process last read it.
+        recorded_at = self.now()
+        line = json.dumps({"key": key, "at": recorded_at, "message": message}) + "\n"
+        with open(self.path, 'ab') as file:
+            file.write(line.encode())
+            if sync:
+                sync(file)
+            self.offset = file.tell()
+        if self.identity is None:
+            st = os.stat(self.path)
+            self.identity = (st.st_dev, st.st_ino)
+        self.remember(key, recorded_at, message)
+        self.lines += 1
+        self.expire()
+        # Expired and evicted keys still take up lines; drop them once they
+        # outnumber the live ones.
+        if self.lines > 2 * len(self.entries) + 1000:
+            self.rewrite(sync)
+
+    def rewrite(self, sync=None):
+        data = "".join(json.dumps({"key": key, "at": recorded_at, "message": message}) + "\n"
+                       for key, (recorded_at, message) in self.entries.items()).encode()
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_native_id()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+            if sync:
+                sync(file)
+        os.replace(temp_path, self.path)
+        st = os.stat(self.path)
+        self.identity = (st.st_dev, st.st_ino)
+        self.offset = len(data)
+        self.lines = len(self.entries)
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+indexes = {}
+indexes_lock = threading.Lock()
+
+
+def index_for(base_folder):
+    # One index per folder per process, shared by all its trackers.
+    path = os.path.abspath(base_folder)
+    with indexes_lock:
+        index = indexes.get(path)
+        if index is None:
+            index = indexes[path] = IdempotencyIndex(base_folder)
+        return index
@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import functools
+from collections import deque
+
+import tracing
+
+# Instrumentation is decided once, at import: with BUDGET_TRACKER_STATS unset
+# @timed hands back the undecorated function, so disabled builds pay nothing.
+# Set it to a file path to get a JSON dump there on exit, or to any other
+# value ("1") to get a table on stderr.
+STATS_ENV = "BUDGET_TRACKER_STATS"
+ENABLED = bool(os.environ.get(STATS_ENV))
+WINDOW = 4096
+
+
+class SpanStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=WINDOW)
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def as_dict(self):
+        recent = sorted(self.recent)
+
+        def percentile(fraction):
+            return recent[min(len(recent) - 1, int(fraction * len(recent)))] * 1000 if recent else 0.0
+
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "max_ms": self.max * 1000,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+
+spans = {}
+guard = threading.Lock()
+active = threading.local()
+
+
+def span_stats(name):
+    stats = spans.get(name)
+    if stats is None:
+        with guard:
+            stats = spans.setdefault(name, SpanStats())
+    return stats
+
+
+def timed(name=None, category="tracker"):
+    # The same spans feed the trace when BUDGET_TRACKER_TRACE is set.
+    def decorate(func):
+        if not (ENABLED or tracing.ENABLED):
+            return func
+        span = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if tracing.ENABLED:
+                tracing.begin(span, category)
+            if not ENABLED:
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    tracing.end(span, category)
+            stack = getattr(active, "stack", None)
+            if stack is None:
+                stack = active.stack = []
+            stack.append(span)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                stack.pop()
+                stats = span_stats(span)
+                with guard:
+                    stats.count += 1
+                    stats.total += elapsed
+                    stats.max = max(stats.max, elapsed)
+                    stats.recent.append(elapsed)
+                if tracing.ENABLED:
+                    tracing.end(span, category)
+
+        return wrapper
+    return decorate
+
+
+def record_io(read=0, written=0):
+    # Bytes count towards every span that is open on this thread, so a
+    # caller's figures include the I/O of the methods it calls.
+    if not ENABLED:
+        return
+    stack = getattr(active, "stack", None) or ["<untimed>"]
+    with guard:
+        for span in set(stack):
+            stats = spans.setdefault(span, SpanStats())
+            stats.bytes_read += read
+            stats.bytes_written += written
+
+
+def stats():
+    with guard:
+        return {name: span.as_dict() for name, span in sorted(spans.items())}
+
+
+def reset():
+    with guard:
+        spans.clear()
+
+
+def format_stats(data):
+    lines = [f"{'span':<40} {'count':>7} {'total ms':>10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+             f"{'read B':>10} {'written B':>10}"]
+    for name, span in data.items():
+        lines.append(f"{name:<40} {span['count']:>7} {span['total_ms']:>10.2f} {span['p50_ms']:>8.3f} "
+                     f"{span['p95_ms']:>8.3f} {span['max_ms']:>8.3f} {span['bytes_read']:>10} "
+                     f"{span['bytes_written']:>10}")
+    return "\n".join(lines)
+
+
+def dump_stats():
+    target = os.environ.get(STATS_ENV)
+    data = stats()
+    if not data:
+        return
+    if target in ("1", "true", "yes", "stderr"):
+        print(format_stats(data), file=sys.stderr)
+    else:
+        with open(target, 'w') as file:
+            json.dump(data, file, indent=2)
+
+
+if ENABLED:
+    atexit.register(dump_stats)
@@ -0,0 +1,174 @@
+"""Memory diagnostics for the tracker's in-memory state.
+
+Takes tracemalloc snapshots around loading the most recent N months into a
+TrackerStore and reports the top allocation sites, plus deep-size accounting
+of the store's structures (per-month transactions and budget, and whatever
+caches and indexes the store holds). Output is JSON with stable ordering and
+repo-relative paths, so reports from two releases can be diffed directly or
+with --compare.
+
+    python memory_profile.py --months 12 --output mem-1.4.json
+    python memory_profile.py --months 12 --compare mem-1.3.json
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import tracemalloc
+
+from expense import DailyBudgetTracker, month_keys
+from tracker_store import TrackerStore
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def deep_sizeof(obj, seen=None):
+    # sys.getsizeof plus everything reachable through containers and
+    # instance attributes, counting shared objects once.
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def site_name(frame, key_type):
+    path = os.path.abspath(frame.filename)
+    if path.startswith(ROOT + os.sep):
+        path = os.path.relpath(path, ROOT)
+    else:
+        path = "<external>/" + os.path.basename(path)
+    return path if key_type == "filename" else f"{path}:{frame.lineno}"
+
+
+def top_sites(before, after, limit, key_type):
+    sites = {}
+    for stat in after.compare_to(before, key_type):
+        if stat.size_diff <= 0:
+            continue
+        site = sites.setdefault(site_name(stat.traceback[0], key_type), {"bytes": 0, "blocks": 0})
+        site["bytes"] += stat.size_diff
+        site["blocks"] += stat.count_diff
+    ranked = sorted(sites.items(), key=lambda item: (-item[1]["bytes"], item[0]))
+    return [{"site": name, **totals} for name, totals in ranked[:limit]]
+
+
+def structure_sizes(store):
+    seen = set()
+    report = {"months": {}}
+    # Count per-month data first so the totals below only add what is left.
+    for (year, month), state in sorted(store.months.items()):
+        columns = state.tracker.load_columns()
+        report["months"][f"{year}-{month:02d}"] = {
+            "transactions": sum(len(part) for part in columns),
+            "transactions_bytes": deep_sizeof(columns, seen),
+            "budget_bytes": deep_sizeof(state.budget, seen),
+        }
+    report["store_total_bytes"] = deep_sizeof(store, set())
+    report["store_other_bytes"] = deep_sizeof(store, seen)
+    report["read_cache_bytes"] = deep_sizeof(DailyBudgetTracker.cache, set())
+    return report
+
+
+def profile_gui(store, year, month, top, key_type):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    from expense import BudgetTrackerGUI
+
+    app = QApplication.instance() or QApplication([])
+    before = tracemalloc.take_snapshot()
+    gui = BudgetTrackerGUI(store.month(year, month).tracker)
+    gui.show_summary_page()
+    app.processEvents()
+    after = tracemalloc.take_snapshot()
+    gui.close()
+    return top_sites(before, after, top, key_type)
+
+
+def profile(base_folder, months, top, frames, gui, key_type):
+    selected = month_keys(base_folder)[-months:]
+    tracemalloc.start(frames)
+    store = TrackerStore(base_folder)
+    DailyBudgetTracker.cache.clear()
+    before = tracemalloc.take_snapshot()
+    for year, month in selected:
+        # A month's transactions and budget are parsed into the tracker's
+        # file cache on first use, not when the store opens the month.
+        state = store.month(year, month)
+        state.tracker.load_columns()
+        state.budget
+    after = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+
+    report = {
+        "meta": {"python": platform.python_version(), "months_loaded": len(selected),
+                 "transactions_loaded": sum(len(part) for state in store.months.values()
+                                            for part in state.tracker.load_columns())},
+        "tracemalloc": {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top_sites": top_sites(before, after, top, key_type),
+        },
+        "structures": structure_sizes(store),
+    }
+    if gui and selected:
+        report["gui"] = {"top_sites": profile_gui(store, *selected[-1], top, key_type)}
+    tracemalloc.stop()
+    return report
+
+
+def flatten(data, prefix=""):
+    for key, value in data.items():
+        if key == "top_sites":
+            value = {site["site"]: site for site in value}
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)):
+            yield f"{prefix}{key}", value
+
+
+def compare(current, baseline):
+    old = dict(flatten(baseline))
+    for key, value in flatten(current):
+        if key.endswith("bytes") and key in old and old[key] != value:
+            change = (value - old[key]) / old[key] if old[key] else float("inf")
+            print(f"{key:<70} {old[key]:>12} -> {value:>12} {change:+8.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-folder", default="budget_data")
+    parser.add_argument("--months", type=int, default=12, help="load the most recent N months")
+    parser.add_argument("--top", type=int, default=25, help="allocation sites to report")
+    parser.add_argument("--frames", type=int, default=1, help="tracemalloc traceback depth")
+    parser.add_argument("--key-type", choices=["lineno", "filename"], default="lineno",
+                        help="group allocation sites by line or by file (steadier across releases)")
+    parser.add_argument("--gui", action="store_true", help="also profile building the window (offscreen)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="REPORT", help="print byte deltas against an earlier report")
+    args = parser.parse_args(argv)
+
+    report = profile(args.base_folder, args.months, args.top, args.frames, args.gui, args.key_type)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+    elif not args.compare:
+        print(text)
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            compare(report, json.load(file))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import os
+import math
+import time
+import threading
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, math.inf)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class BoundMetric:
+    def __init__(self, metric, labelvalues):
+        self.metric = metric
+        self.labelvalues = labelvalues
+
+    def inc(self, amount=1):
+        self.metric.inc(amount, self.labelvalues)
+
+    def dec(self, amount=1):
+        self.metric.dec(amount, self.labelvalues)
+
+    def set(self, value):
+        self.metric.set(value, self.labelvalues)
+
+    def observe(self, value):
+        self.metric.observe(value, self.labelvalues)
+
+    def time(self):
+        return self.metric.time(self.labelvalues)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=(), function=None):
+        # function, if given, is called at scrape time and returns either a
+        # single value or a {labelvalues tuple: value} dict.
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *labelvalues):
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return BoundMetric(self, tuple(str(value) for value in labelvalues))
+
+    def current(self):
+        if self.function is None:
+            with self.lock:
+                return dict(self.values)
+        value = self.function()
+        return value if isinstance(value, dict) else {(): value}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, value in sorted(self.current().items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, labelvalues)} {format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, labelvalues=()):
+        if amount < 0:
+            raise ValueError("Counters can only go up")
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, labelvalues=()):
+        with self.lock:
+            self.values[labelvalues] = value
+
+    def inc(self, amount=1, labelvalues=()):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def dec(self, amount=1, labelvalues=()):
+        self.inc(-amount, labelvalues)
+
+
+class HistogramTimer:
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, self.labelvalues)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        if self.buckets[-1] != math.inf:
+            self.buckets += (math.inf,)
+
+    def observe(self, value, labelvalues=()):
+        with self.lock:
+            series = self.values.get(labelvalues)
+            if series is None:
+                series = self.values[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def time(self, labelvalues=()):
+        return HistogramTimer(self, labelvalues)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            series = {labelvalues: (list(counts), total, count)
+                      for labelvalues, (counts, total, count) in self.values.items()}
+        for labelvalues, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labelnames, labelvalues, [("le", format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=(), function=None):
+        return self.register(Counter(name, help, labelnames, function))
+
+    def gauge(self, name, help, labelnames=(), function=None):
+        return self.register(Gauge(name, help, labelnames, function))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        # Prometheus text exposition format, version 0.0.4.
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        # Atomic so a scraper (e.g. node_exporter's textfile collector) never
+        # reads a partial file.
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as file:
+            file.write(self.render())
+        os.replace(temp_path, path)
+
+
+def start_textfile_writer(registry, path, interval=15.0):
+    # Rewrites the exposition file every `interval` seconds until the
+    # returned event is set, then once more so the final values land.
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            registry.write_textfile(path)
+        registry.write_textfile(path)
+
+    threading.Thread(target=run, name="metrics-writer", daemon=True).start()
+    return stop
@@ -0,0 +1,391 @@
+import os
+import sys
+import time
+import heapq
+import bisect
+import itertools
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = int(float(os.environ.get("BUDGET_TRACKER_CACHE_MB", "64")) * 1024 * 1024)
+# A file modified this close to when we read it may change again within the
+# same mtime tick without its size changing, so such entries are re-read
+# once before they are trusted (the "racy clean" problem).
+RACY_WINDOW_NS = 100_000_000
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+# Returned by TransactionColumns.find for ids the segment knows nothing about.
+MISSING = object()
+
+
+def make_row(transaction_id, date, category, amount):
+    if transaction_id is None:
+        return {"date": date, "category": category, "amount": amount}
+    return {"id": transaction_id, "date": date, "category": category, "amount": amount}
+
+
+class TransactionColumns:
+    # A month file's transactions stored column-wise, with running
+    # per-category totals and counts so summaries don't have to walk the rows.
+    # A log also holds edit and delete records, which carry the row's old
+    # values so the totals move by the difference. Those aimed at a row in
+    # the same segment are applied in place; the rest land in `overrides`
+    # (id -> replacement row, or None once deleted) and are applied over the
+    # earlier segment when rows are read. `ordered` stays true while every
+    # row has an id and ids only increase, which lets page() bisect;
+    # `missing_ids` is set once a row without one (from before ids existed)
+    # is seen. A cached instance is shared by every thread while the writer
+    # appends to it, so both sides hold `lock` while they touch the columns.
+    def __init__(self, records=()):
+        self.lock = threading.Lock()
+        self.ordered = True
+        self.missing_ids = False
+        self.ids = []
+        self.dates = []
+        self.categories = []
+        self.amounts = []
+        self.positions = {}
+        self.deleted = set()
+        self.overrides = {}
+        self.totals = {}
+        self.counts = {}
+        self.extend(records)
+
+    @classmethod
+    def from_columns(cls, ids, dates, categories, amounts, deleted=None, overrides=None, totals=None, counts=None):
+        # totals and counts must be given when there are overrides, since
+        # those record only the new values.
+        columns = cls()
+        columns.ids = ids
+        columns.dates = dates
+        columns.categories = categories
+        columns.amounts = amounts
+        columns.positions = {transaction_id: index for index, transaction_id in enumerate(ids)
+                             if transaction_id is not None}
+        columns.missing_ids = None in ids
+        columns.ordered = not columns.missing_ids and all(map(str.__lt__, ids, ids[1:]))
+        columns.deleted = set(deleted or ())
+        columns.overrides = dict(overrides or {})
+        if totals is not None:
+            columns.totals = dict(totals)
+            columns.counts = dict(counts)
+        else:
+            for index, (category, amount) in enumerate(zip(categories, amounts)):
+                if index not in columns.deleted:
+                    columns.count(category, amount, 1)
+        return columns
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def count(self, category, amount, sign):
+        self.totals[category] = self.totals.get(category, 0) + sign * amount
+        self.counts[category] = self.counts.get(category, 0) + sign
+
+    def extend(self, records):
+        with self.lock:
+            for record in records:
+                op = record.get("op")
+                if op is None:
+                    self.append(record)
+                else:
+                    self.apply(op, record)
+
+    def append(self, row):
+        transaction_id = row.get("id")
+        category = sys.intern(row["category"])
+        amount = row["amount"]
+        if self.ordered and (transaction_id is None or (self.ids and not self.ids[-1] < transaction_id)):
+            self.ordered = False
+        if transaction_id is not None:
+            self.positions[transaction_id] = len(self.amounts)
+        else:
+            self.missing_ids = True
+        self.ids.append(transaction_id)
+        self.dates.append(sys.intern(row["date"]))
+        self.categories.append(category)
+        self.amounts.append(amount)
+        self.count(category, amount, 1)
+
+    def apply(self, op, record):
+        transaction_id = record["id"]
+        old = record["old"]
+        new = record["new"] if op == "edit" else None
+        self.count(sys.intern(old["category"]), old["amount"], -1)
+        if new is not None:
+            new = make_row(transaction_id, sys.intern(new["date"]), sys.intern(new["category"]), new["amount"])
+            self.count(new["category"], new["amount"], 1)
+        index = self.positions.get(transaction_id)
+        if index is None:
+            self.overrides[transaction_id] = new
+        elif new is None:
+            self.deleted.add(index)
+        else:
+            self.dates[index] = new["date"]
+            self.categories[index] = new["category"]
+            self.amounts[index] = new["amount"]
+
+    def find(self, transaction_id):
+        # The row as of this segment: a dict, None if it was deleted, or
+        # MISSING if the segment has never seen the id.
+        with self.lock:
+            if transaction_id in self.overrides:
+                row = self.overrides[transaction_id]
+                return dict(row) if row else None
+            index = self.positions.get(transaction_id)
+            if index is None:
+                return MISSING
+            if index in self.deleted:
+                return None
+            return make_row(transaction_id, self.dates[index], self.categories[index], self.amounts[index])
+
+    def overrides_copy(self):
+        with self.lock:
+            return dict(self.overrides)
+
+    def totals_copy(self):
+        # (totals, counts) as of one moment.
+        with self.lock:
+            return dict(self.totals), dict(self.counts)
+
+    def rows(self, later_overrides=(), start=0, limit=None):
+        # later_overrides: the overrides of the segments after this one, in
+        # order; the last one to mention an id wins. start and limit select
+        # by row index and by number of rows returned.
+        with self.lock:
+            rows = []
+            deleted = self.deleted
+            stop = len(self.amounts)
+            if limit is not None:
+                # Enough rows to fill the page even if every deleted one is in it.
+                removed = len(deleted) + sum(1 for overrides in later_overrides
+                                             for row in overrides.values() if row is None)
+                stop = min(stop, start + limit + removed)
+            for index, transaction_id, date, category, amount in zip(
+                    range(start, stop), self.ids[start:stop], self.dates[start:stop],
+                    self.categories[start:stop], self.amounts[start:stop]):
+                if limit is not None and len(rows) >= limit:
+                    break
+                if deleted and index in deleted:
+                    continue
+                if later_overrides and transaction_id is not None:
+                    replaced = MISSING
+                    for overrides in reversed(later_overrides):
+                        if transaction_id in overrides:
+                            replaced = overrides[transaction_id]
+                            break
+                    if replaced is not MISSING:
+                        if replaced is not None:
+                            rows.append(dict(replaced))
+                        continue
+                rows.append(make_row(transaction_id, date, category, amount))
+            return rows
+
+    def estimated_size(self):
+        # Four pointer arrays, one float and one id string per row, and the
+        # id index; dates and categories are interned and shared, so they are
+        # counted once per category.
+        with self.lock:
+            rows = len(self.amounts)
+            id_size = sys.getsizeof(next((i for i in self.ids if i is not None), ""))
+            return (4 * sys.getsizeof(self.amounts) + (24 + id_size) * rows + sys.getsizeof(self.positions)
+                    + sum(sys.getsizeof(category) for category in self.totals) + sys.getsizeof(self.totals)
+                    + 200 * len(self.overrides))
+
+
+def later_overrides(segments, index):
+    # Copies of the overrides of the segments after segments[index]; the
+    # log may be appended to while they are applied.
+    return [overrides for overrides in (later.overrides_copy() for later in segments[index + 1:]) if overrides]
+
+
+def merged_rows(segments):
+    # Rows of consecutive segments (transactions.json, then the log) with
+    # each segment's edits and deletes applied to the ones before it.
+    rows = []
+    for index, segment in enumerate(segments):
+        rows.extend(segment.rows(later_overrides(segments, index)))
+    return rows
+
+
+def row_key(row):
+    return row.get("id") or ""
+
+
+def merged_page(segments, after_id=None, inclusive=False, limit=100):
+    # The first `limit` merged rows in id order whose id is above after_id
+    # (or equal to it, if inclusive). Segments kept in id order are bisected,
+    # so a page costs O(log n + limit); the others are filtered and sorted.
+    pages = []
+    for index, segment in enumerate(segments):
+        later = later_overrides(segments, index)
+        if segment.ordered:
+            start = 0
+            if after_id is not None:
+                with segment.lock:
+                    start = (bisect.bisect_left if inclusive else bisect.bisect_right)(segment.ids, after_id)
+            pages.append(segment.rows(later, start, limit))
+        else:
+            rows = segment.rows(later)
+            if after_id is not None:
+                rows = [row for row in rows if row_key(row) > after_id
+                        or inclusive and row_key(row) == after_id]
+            rows.sort(key=row_key)
+            pages.append(rows[:limit])
+    return list(itertools.islice(heapq.merge(*pages, key=row_key), limit))
+
+
+def merged_totals(segments):
+    totals = {}
+    counts = {}
+    for segment in segments:
+        segment_totals, segment_counts = segment.totals_copy()
+        for category, amount in segment_totals.items():
+            totals[category] = totals.get(category, 0) + amount
+            counts[category] = counts.get(category, 0) + segment_counts[category]
+    # Categories whose last row was edited away or deleted drop out.
+    return {category: amount for category, amount in totals.items() if counts[category]}
+
+
+def estimated_size(value):
+    if hasattr(value, "estimated_size"):
+        return value.estimated_size()
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class CacheEntry:
+    __slots__ = ("signature", "value", "size", "trusted")
+
+    def __init__(self, signature, value, size, trusted):
+        self.signature = signature
+        self.value = value
+        self.size = size
+        self.trusted = trusted
+
+
+class FileCache:
+    # Parsed file contents keyed by path and validated against
+    # (device, inode, mtime_ns, size) on every lookup, so edits from other
+    # processes or by hand are picked up. Least recently used entries are
+    # evicted once the estimated size passes max_bytes.
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, loader):
+        # Returns None when the file doesn't exist.
+        signature = file_signature(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry.signature == signature and signature is not None:
+                if entry.trusted or not self.is_racy(signature):
+                    entry.trusted = True
+                    self.entries.move_to_end(path)
+                    self.hits += 1
+                    return entry.value
+            self.misses += 1
+            if entry is not None:
+                self.drop(path)
+        if signature is None:
+            return None
+        value = loader(path)
+        # Trusted once the file is old enough that a same-tick rewrite is
+        # no longer possible; until then the next lookup re-reads it.
+        self.store(path, signature, value, trusted=False)
+        return value
+
+    def is_racy(self, signature):
+        return signature[2] >= time.time_ns() - RACY_WINDOW_NS
+
+    def put(self, path, value):
+        # For contents this process just wrote with a rename, which always
+        # gives the file a new inode.
+        signature = file_signature(path)
+        if signature is not None:
+            self.store(path, signature, value, trusted=True)
+
+    def extend(self, path, expected_signature, rows, factory=TransactionColumns):
+        # After appending rows to path: if nobody else touched the file since
+        # expected_signature was taken, fold the rows into the cached columns
+        # instead of re-parsing the whole file next time.
+        signature = file_signature(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if (entry is not None and entry.signature == expected_signature
+                    and (entry.trusted or not self.is_racy(expected_signature))):
+                entry.value.extend(rows)
+                entry.signature = signature
+                entry.trusted = True
+                self.bytes -= entry.size
+                entry.size = estimated_size(entry.value)
+                self.bytes += entry.size
+                self.entries.move_to_end(path)
+                self.evict()
+                return
+            if entry is not None:
+                self.drop(path)
+        if expected_signature is None and signature is not None:
+            self.store(path, signature, factory(rows), trusted=True)
+
+    def contains(self, path):
+        with self.lock:
+            return path in self.entries
+
+    def store(self, path, signature, value, trusted):
+        size = estimated_size(value)
+        with self.lock:
+            if path in self.entries:
+                self.drop(path)
+            if size > self.max_bytes:
+                return
+            self.entries[path] = CacheEntry(signature, value, size, trusted)
+            self.bytes += size
+            self.evict()
+
+    def evict(self):
+        while self.bytes > self.max_bytes and self.entries:
+            path = next(iter(self.entries))
+            self.drop(path)
+            self.evictions += 1
+
+    def drop(self, path):
+        entry = self.entries.pop(path)
+        self.bytes -= entry.size
+
+    def invalidate(self, path):
+        with self.lock:
+            if path in self.entries:
+                self.drop(path)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,100 @@
+import io
+import re
+import csv
+
+NOT_AMOUNT = re.compile(r"[^\d.\-]")
+# A cell that reads as an amount, currency sign and separators included;
+# stricter than parse_amount, so dates and codes like "B2" don't pass.
+AMOUNT = re.compile(r"-?[$€£¥]?\s*-?[\d,]*\.?\d+")
+DATE = re.compile(r"\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}")
+WORD = re.compile(r"[^\W\d_]+")
+# Header names, by preference, as the start of any word in the cell.
+CATEGORY_NAMES = ("category", "categories", "type", "item", "description", "payee", "merchant")
+AMOUNT_NAMES = ("amount", "cost", "price", "total", "value", "spent", "paid", "debit")
+
+
+class PastedRow:
+    __slots__ = ("line", "category", "amount", "error")
+
+    def __init__(self, line, category, amount=None, error=None):
+        self.line = line
+        self.category = category
+        self.amount = amount
+        self.error = error
+
+
+def parse_amount(text):
+    # "$1,234.50" -> 1234.5; raises ValueError for anything without a number.
+    return float(NOT_AMOUNT.sub("", text))
+
+
+def named_column(words, names):
+    for name in names:
+        for i, cell_words in enumerate(words):
+            if any(word.startswith(name) for word in cell_words):
+                return i
+    return None
+
+
+def header_columns(cells):
+    # (category column, amount column) if cells is a header row: no cell
+    # reads as an amount and at least one names either column. A column it
+    # doesn't name is None.
+    cells = [cell.strip() for cell in cells]
+    if any(AMOUNT.fullmatch(cell) for cell in cells):
+        return None
+    words = [WORD.findall(cell.casefold()) for cell in cells]
+    category = named_column(words, CATEGORY_NAMES)
+    amount = named_column(words, AMOUNT_NAMES)
+    if category == amount:
+        return None
+    return category, amount
+
+
+def value_columns(cells):
+    # (category column, amount column) guessed from a row of values: the
+    # first cell with a number is the amount, and the first with text that
+    # isn't a date the category.
+    cells = [cell.strip() for cell in cells]
+    amount = next((i for i, cell in enumerate(cells) if AMOUNT.fullmatch(cell)), 1)
+    category = next((i for i, cell in enumerate(cells)
+                     if cell and not AMOUNT.fullmatch(cell) and not DATE.fullmatch(cell)), 0)
+    return category, amount
+
+
+def parse_pasted(text):
+    # A PastedRow for every non-blank row of tab- or comma-separated text
+    # (whichever the first line uses), as copied from a spreadsheet. Rows
+    # that can't be added keep their text and say why in error.
+    first_line = text.lstrip("\r\n").split("\n", 1)[0]
+    delimiter = "\t" if "\t" in first_line else ","
+    reader = csv.reader(io.StringIO(text, newline=""), delimiter=delimiter)
+    rows = [(reader.line_num, cells) for cells in reader if any(cell.strip() for cell in cells)]
+    if not rows:
+        return []
+    columns = header_columns(rows[0][1])
+    if columns:
+        rows = rows[1:]
+        if not rows:
+            return []
+    category_column, amount_column = value_columns(rows[0][1])
+    if columns:
+        named_category, named_amount = columns
+        amount_column = named_amount if named_amount is not None else amount_column
+        category_column = named_category if named_category is not None else category_column
+    width = max(category_column, amount_column) + 1
+    pasted = []
+    for line, cells in rows:
+        if len(cells) < width:
+            pasted.append(PastedRow(line, delimiter.join(cells), error="too few columns"))
+            continue
+        category = cells[category_column].strip()
+        amount = cells[amount_column].strip()
+        if not category:
+            pasted.append(PastedRow(line, category, error="no category"))
+            continue
+        try:
+            pasted.append(PastedRow(line, category, parse_amount(amount)))
+        except ValueError:
+            pasted.append(PastedRow(line, category, error=f"{amount!r} is not an amount"))
+    return pasted
@@ -0,0 +1,187 @@
+import sys
+import array
+import struct
+import zlib
+
+from month_cache import TransactionColumns
+from transaction_ids import ID_BYTES, id_to_bytes, id_from_bytes
+
+# snapshot.bin layout, little-endian:
+#   header    magic, transactions.json mtime_ns and size (-1 if absent),
+#             transactions.jsonl device and inode, the log offset the
+#             snapshot covers, a CRC of the bytes just before that offset,
+#             and the number of strings
+#   strings   u16 length + UTF-8, once per distinct date and category
+#   2 parts   transactions.json then the log up to the offset: u32 row
+#             count, 16-byte transaction ids, u32 date ids, u32 category
+#             ids, f64 amounts; u32 count of deleted row indexes and the
+#             indexes; u32 count of overrides (edits and deletes of earlier
+#             rows) as id, present flag, date, category and amount; u32
+#             count of per-category totals as category, total and row count
+MAGIC = b"BTSNAP02"
+HEADER = struct.Struct("<8sqqQQqII")
+LENGTH = struct.Struct("<H")
+COUNT = struct.Struct("<I")
+OVERRIDE = struct.Struct("<%dsBIId" % ID_BYTES)
+TOTAL = struct.Struct("<Idq")
+# Bytes of the log, ending at the covered offset, that must still match.
+TAIL_CHECK_BYTES = 64
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+class Snapshot:
+    def __init__(self, base_signature, log_identity, log_offset, tail_crc, base, log):
+        # base_signature is (mtime_ns, size) of transactions.json or None;
+        # log_identity is (device, inode) of transactions.jsonl or None.
+        self.base_signature = base_signature
+        self.log_identity = log_identity
+        self.log_offset = log_offset
+        self.tail_crc = tail_crc
+        self.base = base
+        self.log = log
+
+
+def read_log_offset(path):
+    # The log offset a snapshot covers, from its header alone; 0 if there is
+    # no usable snapshot.
+    try:
+        with open(path, 'rb') as file:
+            header = file.read(HEADER.size)
+        magic, _, _, _, _, log_offset, _, _ = HEADER.unpack(header)
+    except (OSError, struct.error):
+        return 0
+    return log_offset if magic == MAGIC else 0
+
+
+def tail_crc(path, offset):
+    if offset <= 0:
+        return 0
+    with open(path, 'rb') as file:
+        start = max(0, offset - TAIL_CHECK_BYTES)
+        file.seek(start)
+        return zlib.crc32(file.read(offset - start))
+
+
+def to_bytes(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def from_bytes(typecode, data):
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def encode_part(columns, strings):
+    # The log may be appended to meanwhile.
+    with columns.lock:
+        intern = strings.setdefault
+        dates = array.array("I", [intern(date, len(strings)) for date in columns.dates])
+        categories = array.array("I", [intern(category, len(strings)) for category in columns.categories])
+        amounts = array.array("d", columns.amounts)
+        deleted = array.array("I", sorted(columns.deleted))
+        chunks = [COUNT.pack(len(amounts)), b"".join(id_to_bytes(i) for i in columns.ids),
+                  to_bytes(dates), to_bytes(categories), to_bytes(amounts),
+                  COUNT.pack(len(deleted)), to_bytes(deleted), COUNT.pack(len(columns.overrides))]
+        for transaction_id, row in columns.overrides.items():
+            if row is None:
+                chunks.append(OVERRIDE.pack(id_to_bytes(transaction_id), 0, 0, 0, 0.0))
+            else:
+                chunks.append(OVERRIDE.pack(id_to_bytes(transaction_id), 1, intern(row["date"], len(strings)),
+                                            intern(row["category"], len(strings)), row["amount"]))
+        chunks.append(COUNT.pack(len(columns.totals)))
+        for category, total in columns.totals.items():
+            chunks.append(TOTAL.pack(intern(category, len(strings)), total, columns.counts[category]))
+        return b"".join(chunks)
+
+
+def decode_part(data, position, strings):
+    (count,) = COUNT.unpack_from(data, position)
+    position += COUNT.size
+    raw_ids = data[position:position + ID_BYTES * count]
+    ids = [id_from_bytes(raw_ids[i:i + ID_BYTES]) for i in range(0, len(raw_ids), ID_BYTES)]
+    position += ID_BYTES * count
+    dates = from_bytes("I", data[position:position + 4 * count])
+    position += 4 * count
+    categories = from_bytes("I", data[position:position + 4 * count])
+    position += 4 * count
+    amounts = from_bytes("d", data[position:position + 8 * count])
+    position += 8 * count
+    if len(amounts) != count or len(ids) != count:
+        raise SnapshotError("Snapshot is truncated")
+    (deleted_count,) = COUNT.unpack_from(data, position)
+    position += COUNT.size
+    deleted = from_bytes("I", data[position:position + 4 * deleted_count])
+    position += 4 * deleted_count
+    (override_count,) = COUNT.unpack_from(data, position)
+    position += COUNT.size
+    overrides = {}
+    for _ in range(override_count):
+        raw_id, present, date, category, amount = OVERRIDE.unpack_from(data, position)
+        position += OVERRIDE.size
+        transaction_id = id_from_bytes(raw_id)
+        overrides[transaction_id] = ({"id": transaction_id, "date": strings[date],
+                                      "category": strings[category], "amount": amount}
+                                     if present else None)
+    (total_count,) = COUNT.unpack_from(data, position)
+    position += COUNT.size
+    totals = {}
+    counts = {}
+    for _ in range(total_count):
+        category, total, rows = TOTAL.unpack_from(data, position)
+        position += TOTAL.size
+        totals[strings[category]] = total
+        counts[strings[category]] = rows
+    columns = TransactionColumns.from_columns(
+        ids, [strings[i] for i in dates], [strings[i] for i in categories], amounts.tolist(),
+        deleted, overrides, totals, counts)
+    return columns, position
+
+
+def encode(snapshot):
+    strings = {}
+    parts = [encode_part(columns, strings) for columns in (snapshot.base or TransactionColumns(), snapshot.log)]
+    base_mtime, base_size = snapshot.base_signature or (-1, -1)
+    log_device, log_inode = snapshot.log_identity or (0, 0)
+    chunks = [HEADER.pack(MAGIC, base_mtime, base_size, log_device, log_inode,
+                          snapshot.log_offset, snapshot.tail_crc, len(strings))]
+    for string in strings:
+        encoded = string.encode()
+        chunks.append(LENGTH.pack(len(encoded)) + encoded)
+    chunks.extend(parts)
+    return b"".join(chunks)
+
+
+def decode(data):
+    try:
+        magic, base_mtime, base_size, log_device, log_inode, log_offset, crc, string_count = \
+            HEADER.unpack_from(data)
+    except struct.error:
+        raise SnapshotError("Snapshot is truncated")
+    if magic != MAGIC:
+        raise SnapshotError("Not a snapshot, or written by an incompatible version")
+    position = HEADER.size
+    strings = []
+    try:
+        for _ in range(string_count):
+            (length,) = LENGTH.unpack_from(data, position)
+            position += LENGTH.size
+            strings.append(sys.intern(data[position:position + length].decode()))
+            position += length
+        parts = []
+        for _ in range(2):
+            columns, position = decode_part(data, position, strings)
+            parts.append(columns)
+    except (struct.error, IndexError, ValueError):
+        raise SnapshotError("Snapshot is corrupt")
+    base_signature = (base_mtime, base_size) if base_size >= 0 else None
+    log_identity = (log_device, log_inode) if log_inode else None
+    return Snapshot(base_signature, log_identity, log_offset, crc,
+                    parts[0] if base_signature else None, parts[1])
@@ -0,0 +1,177 @@
+"""Import a bank statement (CSV) into the tracker, skipping rows already imported.
+
+Every row is fingerprinted as (date, amount, normalized description) and
+checked against its month's fingerprint store (fingerprints.py): a Bloom
+filter kept next to the month's files, confirmed against the exact list only
+when the filter says "maybe". Re-importing a statement, or importing one that
+overlaps an earlier one, adds only the rows not seen before; the skipped rows
+are reported. Nothing but the filters of the months touched is read.
+
+Rows without a category column are categorized by the rules in
+category_rules.json (categorization.py), when the data folder has one.
+
+    python statement_import.py statement.csv --category Imported
+    python statement_import.py statement.csv --dry-run --show-duplicates
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import datetime
+import itertools
+
+from expense import DailyBudgetTracker
+from categorization import Categorizer
+from fingerprints import FingerprintStore, fingerprint, normalize_description
+from pasted_rows import parse_amount
+
+
+class StatementRow:
+    __slots__ = ("line", "date", "amount", "description", "category")
+
+    def __init__(self, line, date, amount, description, category):
+        self.line = line
+        self.date = date
+        self.amount = amount
+        self.description = description
+        self.category = category
+
+
+class ImportResult:
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.duplicates = []
+        self.credits = 0
+        self.errors = []
+        self.months = set()
+        self.confirmations = 0
+
+    def report(self):
+        months = ", ".join(f"{year}-{month:02d}" for year, month in sorted(self.months)) or "none"
+        return (f"Read {self.read} rows: {self.imported} imported, {len(self.duplicates)} duplicates skipped, "
+                f"{self.credits} credits skipped, {len(self.errors)} unreadable. Months: {months}.")
+
+
+def read_statement(file, result, columns, date_format=None, sign="negative"):
+    # Yields StatementRow for every expense in the CSV, counting credits and
+    # unreadable rows in result as it goes. sign says how expenses appear:
+    # "negative" (credits positive), "positive", or "any".
+    date_column, description_column, amount_column, category_column = columns
+    reader = csv.DictReader(file)
+    fields = {name.strip().lower(): name for name in reader.fieldnames or ()}
+    for column in (date_column, description_column, amount_column):
+        if column.lower() not in fields:
+            raise ValueError(f"Statement has no {column!r} column (found: {', '.join(fields.values())})")
+    date_field = fields[date_column.lower()]
+    description_field = fields[description_column.lower()]
+    amount_field = fields[amount_column.lower()]
+    category_field = fields.get(category_column.lower()) if category_column else None
+    for row in reader:
+        line = reader.line_num
+        result.read += 1
+        try:
+            text = row[date_field].strip()
+            date = (datetime.datetime.strptime(text, date_format).date() if date_format
+                    else datetime.date.fromisoformat(text))
+            amount = parse_amount(row[amount_field])
+        except (ValueError, TypeError, AttributeError) as e:
+            result.errors.append((line, str(e)))
+            continue
+        if amount == 0 or (sign == "negative" and amount > 0) or (sign == "positive" and amount < 0):
+            result.credits += 1
+            continue
+        category = (row.get(category_field) or "").strip() if category_field else ""
+        yield StatementRow(line, date, round(abs(amount), 2), row[description_field] or "", category or None)
+
+
+def import_statement(base_folder, rows, category="Imported", dry_run=False, chunk_size=5000, result=None,
+                     categorizer=None):
+    # Rows are handled in chunks, one month lock per month per chunk, so a
+    # large statement streams through without holding a lock for long. A
+    # row's own category comes first, then the categorizer's, then category.
+    result = result or ImportResult()
+    occurrences = {}
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return result
+        by_month = {}
+        for row in chunk:
+            if row.category is None and categorizer is not None:
+                row.category = categorizer.categorize(row.description)
+            key = (row.date, row.amount, normalize_description(row.description))
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+            item = (row, fingerprint(row.date.isoformat(), row.amount, row.description, occurrence))
+            by_month.setdefault((row.date.year, row.date.month), []).append(item)
+        for (year, month), items in by_month.items():
+            result.months.add((year, month))
+            tracker = DailyBudgetTracker(base_folder, year, month)
+            transactions = []
+            with tracker.month_lock():
+                store = FingerprintStore(tracker.current_folder)
+                fresh = []
+                for row, digest in items:
+                    if digest in store:
+                        result.duplicates.append(row)
+                    else:
+                        fresh.append((row, digest))
+                result.confirmations += store.confirmations
+                if fresh and not dry_run:
+                    transactions = [tracker.make_transaction(row.category or category, row.amount, row.date)
+                                    for row, _ in fresh]
+                    tracker.append_transactions(transactions)
+                    tracker.charge_budget(sum(row.amount for row, _ in fresh))
+                    store.add_all([digest for _, digest in fresh], tracker.sync)
+                result.imported += len(fresh)
+            tracker.record_category_use(transactions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("statement", help="CSV file with a header row")
+    parser.add_argument("--base-folder", default="budget_data")
+    parser.add_argument("--category", default="Imported", help="category for rows without one")
+    parser.add_argument("--date-column", default="date")
+    parser.add_argument("--description-column", default="description")
+    parser.add_argument("--amount-column", default="amount")
+    parser.add_argument("--category-column", default="category", help="used when the statement has it")
+    parser.add_argument("--date-format", help="strptime format, e.g. %%d/%%m/%%Y (default: ISO dates)")
+    parser.add_argument("--sign", choices=["negative", "positive", "any"], default="negative",
+                        help="how expenses appear in the amount column; rows of the other sign are credits")
+    parser.add_argument("--rules", help="categorization rules (default: category_rules.json in the data folder)")
+    parser.add_argument("--encoding", default="utf-8-sig")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be imported without writing")
+    parser.add_argument("--show-duplicates", action="store_true", help="list the rows skipped as duplicates")
+    args = parser.parse_args(argv)
+
+    columns = (args.date_column, args.description_column, args.amount_column, args.category_column)
+    result = ImportResult()
+    started = time.perf_counter()
+    rules = args.rules or os.path.join(args.base_folder, "category_rules.json")
+    try:
+        categorizer = Categorizer.from_file(rules) if args.rules or os.path.exists(rules) else None
+        with open(args.statement, newline='', encoding=args.encoding) as file:
+            rows = read_statement(file, result, columns, args.date_format, args.sign)
+            import_statement(args.base_folder, rows, args.category, args.dry_run, result=result,
+                             categorizer=categorizer)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - started
+    print(("Dry run. " if args.dry_run else "") + result.report())
+    print(f"{result.read / elapsed if elapsed else 0:,.0f} rows/sec, "
+          f"{result.confirmations} Bloom filter hits checked against the exact list")
+    if args.show_duplicates:
+        for row in result.duplicates:
+            print(f"  duplicate, line {row.line}: {row.date} {row.amount:.2f} {row.description}")
+    for line, error in result.errors:
+        print(f"  unreadable, line {line}: {error}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
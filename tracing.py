@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import atexit
+import threading
+from collections import deque
+
+# Set BUDGET_TRACKER_TRACE to a file path to record begin/end events for
+# tracker operations, file I/O, JSON parse/serialize and Qt event dispatch.
+# The file is written at exit in Chrome trace-event format; open it in
+# chrome://tracing or https://ui.perfetto.dev. Like instrumentation, this is
+# decided at import time. Only the last BUDGET_TRACKER_TRACE_EVENTS events
+# are kept, so a long session can't grow the buffer without bound.
+TRACE_ENV = "BUDGET_TRACKER_TRACE"
+ENABLED = bool(os.environ.get(TRACE_ENV))
+MAX_EVENTS = int(os.environ.get("BUDGET_TRACKER_TRACE_EVENTS", "1000000"))
+
+events = deque(maxlen=MAX_EVENTS)
+guard = threading.Lock()
+# Kept apart from events so the oldest threads keep their names.
+thread_names = {}
+emitted = 0
+pid = os.getpid()
+origin = time.perf_counter_ns()
+
+
+def timestamp():
+    return (time.perf_counter_ns() - origin) / 1000
+
+
+def emit(phase, name, category, args=None):
+    tid = threading.get_native_id()
+    event = {"name": name, "cat": category, "ph": phase, "ts": timestamp(), "pid": pid, "tid": tid}
+    if args:
+        event["args"] = args
+    global emitted
+    with guard:
+        if tid not in thread_names:
+            thread_names[tid] = threading.current_thread().name
+        events.append(event)
+        emitted += 1
+
+
+def begin(name, category, args=None):
+    emit("B", name, category, args)
+
+
+def end(name, category):
+    emit("E", name, category)
+
+
+class Span:
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        begin(self.name, self.category, self.args)
+        return self
+
+    def __exit__(self, *exc_info):
+        end(self.name, self.category)
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name, category, **args):
+    # With tracing off this is one call returning a shared no-op span, cheap
+    # next to the file reads and writes it wraps.
+    if not ENABLED:
+        return NULL_SPAN
+    return Span(name, category, args or None)
+
+
+def write_trace(path=None):
+    path = path or os.environ.get(TRACE_ENV)
+    with guard:
+        names = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in thread_names.items()]
+        data = {"traceEvents": names + list(events), "displayTimeUnit": "ms",
+                "otherData": {"dropped_events": emitted - len(events)}}
+    with open(path, 'w') as file:
+        json.dump(data, file)
+
+
+if ENABLED:
+    atexit.register(write_trace)
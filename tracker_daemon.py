@@ -0,0 +1,239 @@
+import os
+import sys
+import json
+import socket
+import argparse
+import calendar
+import socketserver
+
+from clock import SYSTEM_CLOCK
+from compaction import Compactor
+from expense import DailyBudgetTracker
+from metrics import start_textfile_writer
+from tracker_store import TrackerStore
+
+DEFAULT_SOCKET = os.path.join("budget_data", "tracker.sock")
+
+
+def encode_message(message):
+    return (json.dumps(message, separators=(',', ':')) + "\n").encode()
+
+
+class TrackerRequestHandler(socketserver.StreamRequestHandler):
+    # One request per line: {"op": ..., "year": ..., "month": ..., "args": [...]}.
+    # Each gets exactly one response line: {"ok": true, "result": ...} or
+    # {"ok": false, "error": ...}. Connections stay open between requests.
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                response = {"ok": True, "result": self.server.dispatch(request)}
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write(encode_message(response))
+
+
+class TrackerDaemon(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    operations = ("set_budget", "add_expense", "add_expenses", "load_budget", "check_budget",
+                  "get_expense_summary", "get_transactions", "get_transactions_page", "edit_expense",
+                  "delete_expense")
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, store=None):
+        self.socket_path = socket_path
+        self.store = store or TrackerStore()
+        self.remove_stale_socket()
+        super().__init__(socket_path, TrackerRequestHandler)
+
+    def remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+        else:
+            raise RuntimeError(f"A tracker daemon is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+
+    def dispatch(self, request):
+        op = request["op"]
+        if op == "ping":
+            return "pong"
+        if op == "metrics":
+            return self.store.metrics.render()
+        if op not in self.operations:
+            raise ValueError(f"Unknown operation: {op}")
+        method = getattr(self.store, op)
+        return method(request["year"], request["month"], *request.get("args", []))
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class TrackerClient:
+    # Drop-in stand-in for DailyBudgetTracker that forwards every call to a
+    # running TrackerDaemon. A client holds one connection; use one per thread.
+    def __init__(self, socket_path=DEFAULT_SOCKET, year=None, month=None, clock=None):
+        self.clock = clock or SYSTEM_CLOCK
+        today = self.clock.today()
+        # Like DailyBudgetTracker, a client without an explicit month moves
+        # to the new month when the date changes.
+        self.follows_clock = year is None and month is None
+        self.socket_path = socket_path
+        self.sock = None
+        self.rfile = None
+        self.select_month(year or today.year, month or today.month)
+
+    def select_month(self, year, month):
+        self.current_year = year
+        self.current_month = month
+        self.current_month_name = calendar.month_name[month]
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+        self.rfile = self.sock.makefile('rb')
+
+    def close(self):
+        if self.sock is not None:
+            self.rfile.close()
+            self.sock.close()
+            self.sock = None
+            self.rfile = None
+
+    def call(self, op, *args):
+        if self.sock is None:
+            self.connect()
+        if self.follows_clock:
+            today = self.clock.today()
+            if (today.year, today.month) != (self.current_year, self.current_month):
+                self.select_month(today.year, today.month)
+        request = {"op": op, "year": self.current_year, "month": self.current_month, "args": args}
+        self.sock.sendall(encode_message(request))
+        line = self.rfile.readline()
+        if not line:
+            self.close()
+            raise ConnectionError("Tracker daemon closed the connection")
+        response = json.loads(line)
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    def ping(self):
+        return self.call("ping")
+
+    def set_budget(self, amount):
+        return self.call("set_budget", amount)
+
+    def load_budget(self):
+        return self.call("load_budget")
+
+    def add_expense(self, category, amount, key=None):
+        return self.call("add_expense", category, amount, key)
+
+    def add_expenses(self, expenses, key=None):
+        return self.call("add_expenses", [list(expense) for expense in expenses], key)
+
+    def check_budget(self):
+        return self.call("check_budget")
+
+    def get_expense_summary(self):
+        return self.call("get_expense_summary")
+
+    def load_transactions(self):
+        return self.call("get_transactions")
+
+    def transactions_page(self, after_id=None, limit=100, since=None):
+        page = self.call("get_transactions_page", after_id, limit, since.isoformat() if since else None)
+        return page["transactions"], page["next_after_id"]
+
+    def edit_expense(self, transaction_id, category=None, amount=None):
+        return self.call("edit_expense", transaction_id, category, amount)
+
+    def delete_expense(self, transaction_id):
+        return self.call("delete_expense", transaction_id)
+
+    def metrics(self):
+        return self.call("metrics")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Single-writer daemon for the Daily Budget Tracker.")
+    parser.add_argument("--socket", default=os.environ.get("BUDGET_TRACKER_SOCKET", DEFAULT_SOCKET))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run the daemon in the foreground")
+    serve.add_argument("--base-folder", default="budget_data")
+    serve.add_argument("--fsync", action="store_true", help="fsync every write before answering")
+    serve.add_argument("--metrics-file", help="keep a Prometheus text exposition file up to date here")
+    serve.add_argument("--metrics-interval", type=float, default=15.0)
+    serve.add_argument("--compact-interval", type=float, default=60.0,
+                       help="seconds between background compaction passes; 0 turns compaction off")
+    serve.add_argument("--carry-forward", action="store_true",
+                       default=bool(os.environ.get("BUDGET_TRACKER_CARRY_FORWARD")),
+                       help="add last month's unspent budget to this month during compaction passes")
+
+    commands.add_parser("metrics", help="print the daemon's metrics in Prometheus text format")
+
+    for name in ("add", "budget", "summary", "check"):
+        command = commands.add_parser(name)
+        command.add_argument("--year", type=int)
+        command.add_argument("--month", type=int)
+        if name == "add":
+            command.add_argument("category")
+            command.add_argument("amount", type=float)
+        elif name == "budget":
+            command.add_argument("amount", type=float)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "serve":
+        os.makedirs(args.base_folder, exist_ok=True)
+        server = TrackerDaemon(args.socket, TrackerStore(args.base_folder, args.fsync))
+        if args.metrics_file:
+            stop_metrics = start_textfile_writer(server.store.metrics, args.metrics_file, args.metrics_interval)
+        if args.compact_interval:
+            compactor = Compactor(args.base_folder, args.compact_interval, carry_forward=args.carry_forward).start()
+        print(f"Tracker daemon listening on {args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if args.compact_interval:
+                compactor.stop()
+            server.store.checkpoint()
+            if args.metrics_file:
+                stop_metrics.set()
+        return 0
+
+    client = TrackerClient(args.socket, getattr(args, "year", None), getattr(args, "month", None))
+    try:
+        if args.command == "metrics":
+            print(client.metrics(), end="")
+        elif args.command == "add":
+            print(client.add_expense(args.category, args.amount))
+            warning = client.check_budget()
+            if warning:
+                print(warning)
+        elif args.command == "budget":
+            print(client.set_budget(args.amount))
+        elif args.command == "summary":
+            print(client.get_expense_summary())
+        elif args.command == "check":
+            print(client.check_budget() or "Budget is on track.")
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+
+class TrackerPool:
+    # One tracker per (year, month), built on first use by factory(year, month)
+    # and reused after that, so switching to a month that is already open is a
+    # dict lookup. Handles pinned with open() stay until close(); the rest are
+    # closed least recently used first once there are more than `capacity`.
+    def __init__(self, factory, capacity=12):
+        self.factory = factory
+        self.capacity = capacity
+        self.handles = OrderedDict()
+        self.pins = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, year, month):
+        key = (year, month)
+        with self.lock:
+            handle = self.handles.get(key)
+            if handle is not None:
+                self.handles.move_to_end(key)
+                self.hits += 1
+                return handle
+            self.misses += 1
+        handle = self.factory(year, month)
+        with self.lock:
+            # Another thread may have built the same month meanwhile.
+            existing = self.handles.get(key)
+            if existing is not None:
+                self.handles.move_to_end(key)
+                discard = handle
+                handle = existing
+            else:
+                self.handles[key] = handle
+                discard = None
+            evicted = self.evict()
+        for stale in evicted + ([discard] if discard is not None else []):
+            close_handle(stale)
+        return handle
+
+    def open(self, year, month):
+        handle = self.get(year, month)
+        with self.lock:
+            self.pins[(year, month)] = self.pins.get((year, month), 0) + 1
+        return handle
+
+    def close(self, year, month):
+        # Releases one open(); the handle stays cached until it is evicted.
+        key = (year, month)
+        with self.lock:
+            if self.pins.get(key, 0) <= 1:
+                self.pins.pop(key, None)
+            else:
+                self.pins[key] -= 1
+            evicted = self.evict()
+        for handle in evicted:
+            close_handle(handle)
+
+    def evict(self):
+        # Callers hold self.lock and close the returned handles after
+        # releasing it, since closing may flush to disk.
+        evicted = []
+        for key in list(self.handles):
+            if len(self.handles) <= self.capacity:
+                break
+            if key not in self.pins:
+                evicted.append(self.handles.pop(key))
+                self.evictions += 1
+        return evicted
+
+    def close_all(self):
+        with self.lock:
+            handles = list(self.handles.values())
+            self.handles.clear()
+            self.pins.clear()
+        for handle in handles:
+            close_handle(handle)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "open": len(self.handles),
+                "pinned": len(self.pins),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def close_handle(handle):
+    close = getattr(handle, "close", None)
+    if close:
+        close()
@@ -0,0 +1,327 @@
+import os
+import sys
+import json
+import math
+import uuid
+import argparse
+import datetime
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from compaction import Compactor
+from metrics import start_textfile_writer
+from idempotency import MAX_KEY_LENGTH
+from tracker_store import TrackerStore
+import transaction_ids
+
+
+def finite_float(value):
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{value!r} is not a finite number")
+    return number
+
+
+class BadRequest(Exception):
+    pass
+
+
+class NotFound(Exception):
+    pass
+
+
+class TrackerHTTPRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep a connection open across requests; every
+    # response therefore carries an explicit Content-Length.
+    protocol_version = "HTTP/1.1"
+    server_version = "BudgetTracker/1.0"
+    # Headers and body go out as separate writes; with Nagle on, keep-alive
+    # clients stall on delayed ACKs for ~40ms per request.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.handle_request({
+            "/budget": self.get_budget,
+            "/summary": self.get_summary,
+            "/transactions": self.get_transactions,
+            "/metrics": self.get_metrics,
+        })
+
+    def do_POST(self):
+        self.handle_request({
+            "/expenses": self.post_expense,
+            "/expenses/bulk": self.post_expenses,
+            "/budget": self.put_budget,
+        })
+
+    def do_PUT(self):
+        self.handle_request({"/budget": self.put_budget})
+
+    def do_PATCH(self):
+        self.handle_request({"/expenses": self.patch_expense})
+
+    def do_DELETE(self):
+        self.handle_request({"/expenses": self.delete_expense})
+
+    def handle_request(self, routes):
+        url = urlsplit(self.path)
+        handler = routes.get(url.path.rstrip("/") or "/")
+        if handler is None:
+            self.send_json(404, {"error": f"No route for {self.command} {url.path}"})
+            return
+        try:
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            handler(query)
+        except BadRequest as e:
+            self.send_json(400, {"error": str(e)})
+        except NotFound as e:
+            self.send_json(404, {"error": str(e)})
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise BadRequest("Request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise BadRequest("Request body must be a JSON object")
+        return body
+
+    def month_from(self, params):
+        today = datetime.date.today()
+        try:
+            year = int(params.get("year") or today.year)
+            month = int(params.get("month") or today.month)
+        except ValueError:
+            raise BadRequest("year and month must be integers")
+        if not 1 <= month <= 12:
+            raise BadRequest("month must be between 1 and 12")
+        return year, month
+
+    def idempotency_key(self):
+        key = self.headers.get("Idempotency-Key")
+        if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+            raise BadRequest(f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+        return key
+
+    def expense_from(self, item):
+        try:
+            return str(item["category"]), finite_float(item["amount"])
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest("Each expense needs a category and a finite numeric amount")
+
+    def send_json(self, status, payload, etag=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_cached(self, year, month, build):
+        # ETags come from the month's write version, so a conditional GET for
+        # an unchanged month is answered without building the payload at all.
+        etag = self.server.etag(year, month)
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        payload = build()
+        self.send_json(200, payload, self.server.etag(year, month, payload.get("version")))
+
+    def get_budget(self, query):
+        year, month = self.month_from(query)
+        store = self.server.store
+
+        def build():
+            return {"version": store.month_version(year, month), "budget": store.load_budget(year, month)}
+
+        self.send_cached(year, month, build)
+
+    def get_summary(self, query):
+        year, month = self.month_from(query)
+        store = self.server.store
+
+        def build():
+            summary = store.summarize(year, month)
+            summary["text"] = store.get_expense_summary(year, month)
+            return summary
+
+        self.send_cached(year, month, build)
+
+    def get_transactions(self, query):
+        year, month = self.month_from(query)
+        category = query.get("category")
+        store = self.server.store
+        if "after_id" in query or "limit" in query or "since" in query:
+            self.send_cached(year, month, lambda: self.transactions_page(year, month, query))
+            return
+
+        def build():
+            version = store.month_version(year, month)
+            transactions = store.get_transactions(year, month)
+            if category is not None:
+                transactions = [t for t in transactions if t["category"] == category]
+            return {"version": version, "transactions": transactions}
+
+        self.send_cached(year, month, build)
+
+    def transactions_page(self, year, month, query):
+        after_id = query.get("after_id") or None
+        if after_id is not None and not transaction_ids.is_valid(after_id):
+            raise BadRequest("after_id is not a transaction id")
+        try:
+            limit = int(query.get("limit") or 100)
+            since = query.get("since") or None
+            if since is not None:
+                datetime.datetime.fromisoformat(since)
+        except ValueError:
+            raise BadRequest("limit must be an integer and since an ISO date or datetime")
+        if not 1 <= limit <= 10000:
+            raise BadRequest("limit must be between 1 and 10000")
+        store = self.server.store
+        version = store.month_version(year, month)
+        page = store.get_transactions_page(year, month, after_id.upper() if after_id else None, limit, since)
+        if query.get("category") is not None:
+            page["transactions"] = [t for t in page["transactions"] if t["category"] == query["category"]]
+        return {"version": version, **page}
+
+    def get_metrics(self, query):
+        body = self.server.store.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def post_expense(self, query):
+        body = self.read_json()
+        year, month = self.month_from({**query, **body})
+        category, amount = self.expense_from(body)
+        message = self.server.store.add_expense(year, month, category, amount, self.idempotency_key())
+        self.send_json(201, {"message": message, "warning": self.server.store.check_budget(year, month)},
+                       self.server.etag(year, month))
+
+    def post_expenses(self, query):
+        body = self.read_json()
+        year, month = self.month_from({**query, **body})
+        items = body.get("expenses")
+        if not isinstance(items, list) or not items:
+            raise BadRequest("expenses must be a non-empty list")
+        expenses = [self.expense_from(item) for item in items]
+        message = self.server.store.add_expenses(year, month, expenses, self.idempotency_key())
+        self.send_json(201, {"message": message, "count": len(expenses),
+                             "warning": self.server.store.check_budget(year, month)},
+                       self.server.etag(year, month))
+
+    def patch_expense(self, query):
+        body = self.read_json()
+        params = {**query, **body}
+        year, month = self.month_from(params)
+        category = params.get("category")
+        try:
+            amount = finite_float(params["amount"]) if params.get("amount") is not None else None
+        except (TypeError, ValueError):
+            raise BadRequest("amount must be a finite number")
+        if category is None and amount is None:
+            raise BadRequest("Nothing to change: give a category and/or an amount")
+        self.change_expense(year, month, "edit_expense", self.id_from(params),
+                            str(category) if category is not None else None, amount)
+
+    def delete_expense(self, query):
+        params = {**query, **self.read_json()}
+        year, month = self.month_from(params)
+        self.change_expense(year, month, "delete_expense", self.id_from(params))
+
+    def id_from(self, params):
+        transaction_id = params.get("id")
+        if not transaction_id or not isinstance(transaction_id, str):
+            raise BadRequest("id is required")
+        return transaction_id
+
+    def change_expense(self, year, month, operation, transaction_id, *args):
+        try:
+            message = getattr(self.server.store, operation)(year, month, transaction_id, *args)
+        except KeyError as e:
+            raise NotFound(e.args[0])
+        self.send_json(200, {"message": message, "warning": self.server.store.check_budget(year, month)},
+                       self.server.etag(year, month))
+
+    def put_budget(self, query):
+        body = self.read_json()
+        year, month = self.month_from({**query, **body})
+        try:
+            amount = finite_float(body["amount"])
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest("amount must be a finite number")
+        message = self.server.store.set_budget(year, month, amount)
+        self.send_json(200, {"message": message}, self.server.etag(year, month))
+
+
+class TrackerHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 8765), store=None, verbose=False):
+        self.store = store or TrackerStore()
+        self.verbose = verbose
+        # Versions restart from zero with the process, so the instance id keeps
+        # ETags from a previous run from matching.
+        self.instance = uuid.uuid4().hex[:8]
+        super().__init__(address, TrackerHTTPRequestHandler)
+
+    def etag(self, year, month, version=None):
+        if version is None:
+            version = self.store.month_version(year, month)
+        return f'"{self.instance}-{year}-{month:02d}-{version}"'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP JSON API for the Daily Budget Tracker.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--base-folder", default="budget_data")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    parser.add_argument("--fsync", action="store_true", help="fsync every write before answering")
+    parser.add_argument("--metrics-file", help="also keep a Prometheus text exposition file up to date here")
+    parser.add_argument("--metrics-interval", type=float, default=15.0)
+    parser.add_argument("--compact-interval", type=float, default=60.0,
+                        help="seconds between background compaction passes; 0 turns compaction off")
+    parser.add_argument("--carry-forward", action="store_true",
+                        default=bool(os.environ.get("BUDGET_TRACKER_CARRY_FORWARD")),
+                        help="add last month's unspent budget to this month during compaction passes")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.base_folder, exist_ok=True)
+    server = TrackerHTTPServer((args.host, args.port), TrackerStore(args.base_folder, args.fsync), args.verbose)
+    if args.metrics_file:
+        stop_metrics = start_textfile_writer(server.store.metrics, args.metrics_file, args.metrics_interval)
+    if args.compact_interval:
+        compactor = Compactor(args.base_folder, args.compact_interval, carry_forward=args.carry_forward).start()
+    print(f"Tracker HTTP API listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.compact_interval:
+            compactor.stop()
+        server.store.checkpoint()
+        if args.metrics_file:
+            stop_metrics.set()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
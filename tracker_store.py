@@ -0,0 +1,227 @@
+import os
+import datetime
+import threading
+from contextlib import contextmanager
+
+from expense import DailyBudgetTracker
+from idempotency import index_for
+from month_cache import file_signature
+from metrics import MetricsRegistry
+
+class MonthState:
+    def __init__(self, tracker):
+        self.tracker = tracker
+        # Transactions live in the tracker's parsed-file cache, which this
+        # process keeps current as the only writer.
+        # Bumped whenever the month's files change, whoever changed them
+        # (GUI, statement import, carry-forward, renormalize); lets the HTTP
+        # server hand out ETags.
+        self.version = 0
+        self.signatures = None
+
+    def current_version(self):
+        tracker = self.tracker
+        signatures = [file_signature(path) for path in (tracker.budget_file, tracker.transactions_file,
+                                                        tracker.log_file)]
+        if signatures != self.signatures:
+            self.signatures = signatures
+            self.version += 1
+        return self.version
+
+    @property
+    def budget(self):
+        # Read through the tracker's file cache rather than kept here, so
+        # budget changes made outside the daemon (carry-forward, statement
+        # imports, renormalize) are never written over.
+        return self.tracker.load_budget()
+
+
+class TrackerStore:
+    # Owns the in-memory state of every month it has touched. All mutations go
+    # through a single lock, so this is the only writer of the month files.
+    def __init__(self, base_folder="budget_data", fsync=False):
+        self.base_folder = base_folder
+        self.fsync = fsync
+        self.months = {}
+        self.lock = threading.Lock()
+        self.register_metrics()
+
+    def register_metrics(self):
+        self.metrics = MetricsRegistry()
+        self.ingested = self.metrics.counter(
+            "budget_tracker_expenses_ingested_total", "Expenses written by this process.")
+        self.write_seconds = self.metrics.histogram(
+            "budget_tracker_write_seconds", "Time spent persisting a mutation.", ["operation"])
+        self.month_lookups = self.metrics.counter(
+            "budget_tracker_month_cache_lookups_total",
+            "Month lookups served from memory (hit) or loaded from disk (miss).", ["result"])
+        self.queued = self.metrics.gauge(
+            "budget_tracker_queued_requests", "Requests waiting for or holding the store lock.")
+        self.metrics.counter(
+            "budget_tracker_fsync_total", "fsync calls made while persisting.", function=self.fsync_count)
+        self.metrics.counter(
+            "budget_tracker_lock_wait_seconds_total", "Time spent waiting for month file locks.",
+            function=lambda: sum(state.tracker.lock_stats.wait_seconds for state in list(self.months.values())))
+        self.metrics.gauge(
+            "budget_tracker_partitions", "Month partitions on disk and loaded in memory.", ["state"],
+            function=self.partition_counts)
+        self.metrics.gauge(
+            "budget_tracker_month_bytes", "On-disk size of each month folder.", ["month"],
+            function=self.month_bytes)
+        self.metrics.counter(
+            "budget_tracker_read_cache_total",
+            "Month file reads served from the parsed-file cache (hit) or parsed again (miss).", ["result"],
+            function=self.read_cache_counts)
+        self.metrics.gauge(
+            "budget_tracker_read_cache_bytes", "Estimated size of the parsed-file cache.",
+            function=lambda: DailyBudgetTracker.cache.stats()["bytes"])
+        self.metrics.counter(
+            "budget_tracker_idempotency_lookups_total",
+            "Keyed add_expense calls that repeated a completed one (hit) or were written (miss).", ["result"],
+            function=self.idempotency_counts)
+
+    @contextmanager
+    def locked(self):
+        self.queued.inc()
+        try:
+            with self.lock:
+                yield
+        finally:
+            self.queued.dec()
+
+    def month(self, year, month):
+        key = (year, month)
+        state = self.months.get(key)
+        if state is None:
+            self.month_lookups.labels("miss").inc()
+            tracker = DailyBudgetTracker(self.base_folder, year, month)
+            tracker.fsync = self.fsync
+            state = MonthState(tracker)
+            self.months[key] = state
+        else:
+            self.month_lookups.labels("hit").inc()
+        return state
+
+    def checkpoint(self):
+        # Snapshots every loaded month so the next start only replays what
+        # is appended after this.
+        with self.locked():
+            for state in self.months.values():
+                state.tracker.checkpoint()
+
+    def read_cache_counts(self):
+        stats = DailyBudgetTracker.cache.stats()
+        return {("hit",): stats["hits"], ("miss",): stats["misses"]}
+
+    def idempotency_counts(self):
+        stats = index_for(self.base_folder).stats()
+        return {("hit",): stats["hits"], ("miss",): stats["misses"]}
+
+    def month_folders(self):
+        if not os.path.isdir(self.base_folder):
+            return []
+        return [entry for entry in os.scandir(self.base_folder) if entry.is_dir()]
+
+    def partition_counts(self):
+        return {("on_disk",): len(self.month_folders()), ("loaded",): len(self.months)}
+
+    def month_bytes(self):
+        sizes = {}
+        for folder in self.month_folders():
+            sizes[(folder.name,)] = sum(entry.stat().st_size for entry in os.scandir(folder.path) if entry.is_file())
+        return sizes
+
+    def fsync_count(self):
+        return sum(state.tracker.fsync_count for state in list(self.months.values()))
+
+    def set_budget(self, year, month, amount):
+        with self.locked():
+            state = self.month(year, month)
+            with self.write_seconds.time(("set_budget",)):
+                result = state.tracker.set_budget(amount)
+            return result
+
+    def add_expense(self, year, month, category, amount, key=None):
+        return self.add_expenses(year, month, [(category, amount)], key)
+
+    def add_expenses(self, year, month, expenses, key=None):
+        if key is not None:
+            with self.locked():
+                tracker = self.month(year, month).tracker
+            return tracker.idempotent(key, self.add_expenses, year, month, expenses)
+        with self.locked():
+            state = self.month(year, month)
+            tracker = state.tracker
+            tracker.refresh_date()
+            transactions = [tracker.make_transaction(category, amount) for category, amount in expenses]
+            with self.write_seconds.time(("add_expenses",)), tracker.month_lock():
+                tracker.append_transactions(transactions)
+                budget_data = tracker.charge_budget(sum(amount for _, amount in expenses))
+            self.ingested.inc(len(transactions))
+            message = tracker.expense_added_message(budget_data, len(expenses))
+        tracker.record_category_use(transactions)
+        return message
+
+    def edit_expense(self, year, month, transaction_id, category=None, amount=None):
+        return self.change_expense(year, month, "edit_expense", transaction_id, category, amount)
+
+    def delete_expense(self, year, month, transaction_id):
+        return self.change_expense(year, month, "delete_expense", transaction_id)
+
+    def change_expense(self, year, month, operation, transaction_id, *args):
+        with self.locked():
+            state = self.month(year, month)
+            with self.write_seconds.time((operation,)):
+                result = getattr(state.tracker, operation)(transaction_id, *args)
+            return result
+
+    def load_budget(self, year, month):
+        with self.locked():
+            return self.month(year, month).budget
+
+    def check_budget(self, year, month):
+        with self.locked():
+            state = self.month(year, month)
+            return state.tracker.budget_warning(state.budget)
+
+    def get_expense_summary(self, year, month):
+        with self.locked():
+            state = self.month(year, month)
+            budget_data = state.budget
+            if not budget_data:
+                return "No budget data available for this month."
+            return state.tracker.format_totals(budget_data, state.tracker.category_totals())
+
+    def get_transactions(self, year, month):
+        with self.locked():
+            return self.month(year, month).tracker.load_transactions()
+
+    def get_transactions_page(self, year, month, after_id=None, limit=100, since=None):
+        # since arrives as an ISO date or datetime string.
+        if since is not None:
+            since = datetime.datetime.fromisoformat(since)
+        with self.locked():
+            rows, next_after_id = self.month(year, month).tracker.transactions_page(after_id, limit, since)
+            return {"transactions": rows, "next_after_id": next_after_id}
+
+    def summarize(self, year, month):
+        with self.locked():
+            state = self.month(year, month)
+            # Taken first: a write from another process landing meanwhile
+            # leaves the ETag stale rather than the payload.
+            version = state.current_version()
+            categories = state.tracker.category_totals()
+            budget_data = state.budget
+            return {
+                "year": year,
+                "month": month,
+                "version": version,
+                "budget": budget_data,
+                "total": sum(categories.values()),
+                "categories": categories,
+                "warning": state.tracker.budget_warning(budget_data),
+            }
+
+    def month_version(self, year, month):
+        with self.locked():
+            return self.month(year, month).current_version()
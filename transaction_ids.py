@@ -0,0 +1,88 @@
+import os
+import time
+import base64
+import datetime
+import threading
+
+# Transaction ids are ULID-style: a 48-bit millisecond timestamp followed by
+# 80 random bits, written as 26 characters of Crockford base32 taken most
+# significant bit first. Ids therefore sort as strings in the order they
+# were issued, and the same holds for the 16 raw bytes kept in snapshots.
+# Rows written before ids existed have none (None here, all-zero bytes in a
+# snapshot) until compaction or sealing gives them one.
+ID_BYTES = 16
+ID_LENGTH = 26
+NO_ID = bytes(ID_BYTES)
+RANDOM_BITS = 80
+
+STANDARD = b"ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+CROCKFORD = b"0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+TO_CROCKFORD = bytes.maketrans(STANDARD, CROCKFORD)
+FROM_CROCKFORD = bytes.maketrans(CROCKFORD, STANDARD)
+
+# Ids issued by this process within the same millisecond increment the
+# random part instead of drawing a new one, so they stay in issue order.
+last_value = 0
+last_lock = threading.Lock()
+
+
+def encode(value):
+    return base64.b32encode(value.to_bytes(ID_BYTES, "big"))[:ID_LENGTH].translate(TO_CROCKFORD).decode()
+
+
+def decode(transaction_id):
+    # Raises ValueError for anything that isn't an id.
+    if not isinstance(transaction_id, str) or len(transaction_id) != ID_LENGTH:
+        raise ValueError(f"Not a transaction id: {transaction_id!r}")
+    try:
+        data = base64.b32decode(transaction_id.upper().encode().translate(FROM_CROCKFORD) + b"======")
+    except (ValueError, UnicodeEncodeError):
+        raise ValueError(f"Not a transaction id: {transaction_id!r}")
+    return int.from_bytes(data, "big")
+
+
+def is_valid(transaction_id):
+    try:
+        decode(transaction_id)
+    except ValueError:
+        return False
+    return True
+
+
+def new_id(timestamp_ms=None):
+    # With timestamp_ms the id sorts with the ones issued at that moment;
+    # used for rows that predate ids, stamped with their date.
+    global last_value
+    if timestamp_ms is not None:
+        return encode(timestamp_ms << RANDOM_BITS | int.from_bytes(os.urandom(10), "big"))
+    value = time.time_ns() // 1_000_000 << RANDOM_BITS | int.from_bytes(os.urandom(10), "big")
+    with last_lock:
+        if value >> RANDOM_BITS <= last_value >> RANDOM_BITS:
+            value = last_value + 1
+        last_value = value
+    return encode(value)
+
+
+def timestamp_ms(when):
+    # when is a date (its local midnight) or a naive local datetime.
+    if not isinstance(when, datetime.datetime):
+        when = datetime.datetime.combine(when, datetime.time())
+    return int(when.timestamp() * 1000)
+
+
+def floor_id(when):
+    # The smallest id that can be issued at `when`; every row added at or
+    # after that moment sorts at or above it.
+    return encode(timestamp_ms(when) << RANDOM_BITS)
+
+
+def id_time(transaction_id):
+    return datetime.datetime.fromtimestamp((decode(transaction_id) >> RANDOM_BITS) / 1000)
+
+
+def id_to_bytes(transaction_id):
+    return decode(transaction_id).to_bytes(ID_BYTES, "big") if transaction_id else NO_ID
+
+
+def id_from_bytes(data):
+    return encode(int.from_bytes(data, "big")) if data != NO_ID else None
@@ -0,0 +1,301 @@
+import queue
+import atexit
+import itertools
+import threading
+import time
+
+from expense import DailyBudgetTracker
+
+STOP = object()
+
+
+class FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class WriteBehindTracker(DailyBudgetTracker):
+    # add_expense only enqueues; a writer thread appends the queued expenses
+    # in batches. A batch is written once flush_count entries are waiting or
+    # flush_interval seconds after its first entry, whichever comes first,
+    # and close() writes whatever is left (also run at exit when
+    # flush_on_close is set). Reads overlay the entries that are still queued,
+    # so callers always see their own writes. When max_pending entries are
+    # queued, add_expense blocks (or raises queue.Full if block_when_full is
+    # off) until the writer catches up. A batch that fails to write is
+    # retried `retries` times; after that its entries are dropped and the
+    # next add_expense, flush or close raises the error, once. Expenses that
+    # were written but not yet charged to the budget stay in `uncharged`
+    # until a charge goes through. Keyed adds are written straight through.
+    def __init__(self, base_folder="budget_data", year=None, month=None, max_pending=10000,
+                 flush_count=500, flush_interval=0.5, flush_on_close=True, block_when_full=True, clock=None,
+                 retries=3, retry_delay=0.1):
+        super().__init__(base_folder, year, month, clock)
+        self.flush_count = flush_count
+        self.flush_interval = flush_interval
+        self.block_when_full = block_when_full
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.queue = queue.Queue(max_pending)
+        self.pending = {}
+        self.uncharged = {}
+        self.sequence = itertools.count()
+        self.month_trackers = {}
+        # Seqlock between the writer and readers: odd while a batch is being
+        # written, so a reader never counts an entry both on disk and pending.
+        self.generation = 0
+        self.state = threading.Condition()
+        self.batches_written = 0
+        self.entries_written = 0
+        self.error = None
+        self.closed = False
+        self.writer = threading.Thread(target=self.writer_loop, name="budget-writer", daemon=True)
+        self.writer.start()
+        if flush_on_close:
+            atexit.register(self.close)
+
+    def month_key(self):
+        return (self.current_year, self.current_month)
+
+    def set_budget(self, amount):
+        # Expenses queued before the new budget must be charged before it is
+        # reset, exactly as they would have been without write-behind.
+        self.flush()
+        return super().set_budget(amount)
+
+    def add_expenses(self, expenses, key=None):
+        if key is not None:
+            # The key is recorded only once the expenses are on disk, so a
+            # retry after a dropped batch adds them rather than being told
+            # they were added.
+            return self.idempotent(key, self.add_expenses_now, expenses)
+        self.raise_error()
+        if self.closed:
+            raise RuntimeError("Tracker is closed")
+        self.refresh_date()
+        key = self.month_key()
+        for category, amount in expenses:
+            transaction = self.make_transaction(category, amount)
+            with self.state:
+                seq = next(self.sequence)
+                self.pending.setdefault(key, {})[seq] = transaction
+            try:
+                self.queue.put((key, seq, transaction), block=self.block_when_full)
+            except queue.Full:
+                with self.state:
+                    del self.pending[key][seq]
+                raise
+        return self.expense_added_message(self.load_budget(), len(expenses))
+
+    def add_expenses_now(self, expenses):
+        # Behind everything already queued, like the edits below.
+        self.flush()
+        if self.closed:
+            raise RuntimeError("Tracker is closed")
+        self.refresh_date()
+        tracker = DailyBudgetTracker(self.base_folder, *self.month_key())
+        tracker.lock_stats = self.lock_stats
+        tracker.add_expenses(expenses)
+        return self.expense_added_message(self.load_budget(), len(expenses))
+
+    def edit_expense(self, transaction_id, category=None, amount=None):
+        return self.change_expense("edit_expense", transaction_id, category, amount)
+
+    def delete_expense(self, transaction_id):
+        return self.change_expense("delete_expense", transaction_id)
+
+    def change_expense(self, method, transaction_id, *args):
+        # The expense may still be queued, so it is flushed first. The change
+        # goes through a plain tracker: this one's load_budget already counts
+        # whatever was queued since, which must not be written back.
+        self.flush()
+        self.refresh_date()
+        tracker = DailyBudgetTracker(self.base_folder, *self.month_key())
+        tracker.lock_stats = self.lock_stats
+        message = getattr(tracker, method)(transaction_id, *args)
+        budget_data = self.load_budget()
+        if not budget_data:
+            return message
+        change = "updated" if method == "edit_expense" else "deleted"
+        return self.expense_changed_message(budget_data, change)
+
+    def seal_finished_month(self, finished, current):
+        # Expenses for the finished month may still be queued.
+        self.flush()
+        super().seal_finished_month(finished, current)
+
+    def pending_for(self, key):
+        return list(self.pending.get(key, {}).values())
+
+    def read_consistent(self, read):
+        while True:
+            with self.state:
+                self.state.wait_for(lambda: self.generation % 2 == 0)
+                generation = self.generation
+                pending = self.pending_for(self.month_key())
+                uncharged = self.uncharged.get(self.month_key(), 0)
+            result = read()
+            with self.state:
+                if self.generation == generation:
+                    return result, pending, uncharged
+
+    def load_budget(self):
+        budget_data, pending, uncharged = self.read_consistent(super().load_budget)
+        if budget_data and (pending or uncharged):
+            budget_data["remaining"] -= sum(transaction["amount"] for transaction in pending) + uncharged
+        return budget_data
+
+    def load_transactions(self):
+        transactions, pending, _ = self.read_consistent(super().load_transactions)
+        return transactions + pending
+
+    def category_totals(self):
+        totals, pending, _ = self.read_consistent(super().category_totals)
+        for transaction in pending:
+            totals[transaction["category"]] = totals.get(transaction["category"], 0) + transaction["amount"]
+        return totals
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def next_batch(self):
+        # Returns (batch, request). The queue is FIFO, so by the time a flush
+        # or close request is dequeued everything added before it is in the
+        # batch or already written.
+        item = self.queue.get()
+        batch = []
+        deadline = time.monotonic() + self.flush_interval if self.flush_interval else None
+        while True:
+            if item is STOP or isinstance(item, FlushRequest):
+                return batch, item
+            batch.append(item)
+            if self.flush_count and len(batch) >= self.flush_count:
+                return batch, None
+            timeout = deadline - time.monotonic() if deadline else None
+            if timeout is not None and timeout <= 0:
+                return batch, None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                return batch, None
+
+    def writer_loop(self):
+        while True:
+            batch, request = self.next_batch()
+            if batch or self.uncharged:
+                self.write_with_retries(batch)
+            if request is STOP:
+                return
+            if request is not None:
+                request.done.set()
+
+    def write_with_retries(self, batch):
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            try:
+                self.write_batch(batch)
+                return
+            except Exception as e:
+                error = e
+            # Months written before the failure are no longer pending.
+            with self.state:
+                batch = [item for item in batch if item[1] in self.pending.get(item[0], {})]
+                uncharged = bool(self.uncharged)
+            if not batch and not uncharged:
+                return
+        if not batch:
+            with self.state:
+                # Retried again with the next batch, or at close.
+                failed = RuntimeError(f"Expenses were written but charging the budget failed: {error}")
+                failed.__cause__ = error
+                self.error = failed
+            return
+        with self.state:
+            for key, seq, _ in batch:
+                del self.pending[key][seq]
+            # Invalidates reads that started with the dropped entries.
+            self.generation += 2
+            dropped = RuntimeError(f"{len(batch)} queued expenses could not be written and were dropped: {error}")
+            dropped.__cause__ = error
+            self.error = dropped
+
+    def raise_error(self):
+        with self.state:
+            error, self.error = self.error, None
+        if error:
+            raise error
+
+    def month_tracker(self, key):
+        tracker = self.month_trackers.get(key)
+        if tracker is None:
+            tracker = DailyBudgetTracker(self.base_folder, *key)
+            tracker.lock_stats = self.lock_stats
+            self.month_trackers[key] = tracker
+        return tracker
+
+    def charge(self, tracker, key):
+        # Callers must hold the month lock.
+        tracker.charge_budget(self.uncharged[key])
+        with self.state:
+            del self.uncharged[key]
+
+    def write_batch(self, batch):
+        by_month = {}
+        for key, seq, transaction in batch:
+            by_month.setdefault(key, []).append((seq, transaction))
+        with self.state:
+            self.generation += 1
+        try:
+            for key in list(self.uncharged):
+                tracker = self.month_tracker(key)
+                with tracker.month_lock():
+                    self.charge(tracker, key)
+            for key, entries in by_month.items():
+                tracker = self.month_tracker(key)
+                transactions = [transaction for _, transaction in entries]
+                with tracker.month_lock():
+                    tracker.append_transactions(transactions)
+                    # On disk now, so a retry must not write them again, only
+                    # charge them.
+                    with self.state:
+                        for seq, _ in entries:
+                            del self.pending[key][seq]
+                        self.uncharged[key] = (self.uncharged.get(key, 0)
+                                               + sum(transaction["amount"] for transaction in transactions))
+                    self.charge(tracker, key)
+                tracker.record_category_use(transactions)
+                self.entries_written += len(entries)
+            if batch:
+                self.batches_written += 1
+        finally:
+            with self.state:
+                self.generation += 1
+                self.state.notify_all()
+
+    def flush(self):
+        if self.closed:
+            return
+        request = FlushRequest()
+        self.queue.put(request)
+        request.done.wait()
+        self.raise_error()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(STOP)
+        self.writer.join()
+        atexit.unregister(self.close)
+        # Anything that raced past the closed check lands after STOP.
+        leftover = []
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if isinstance(item, FlushRequest):
+                item.done.set()
+            elif item is not STOP:
+                leftover.append(item)
+        if leftover or self.uncharged:
+            self.write_with_retries(leftover)
+        self.raise_error()